@@ -0,0 +1,392 @@
+"""
+Music load test
+Runs the Music cog for N guilds at once without YouTube or Discord voice
+
+A stub extractor looks tracks up, and every track is linked into a throwaway audio
+cache, so the cog plays local files the way it plays cached tracks. A fake voice client reads one frame
+every 20 ms in its own thread like discord.py's AudioPlayer, encoding PCM frames
+the same way. Each guild queues, skips and views the queue on a random schedule.
+For every guild count it reports event loop lag, CPU, RSS, ffmpeg processes and
+frames that missed their send slot.
+
+Needs ffmpeg on PATH. Without --files, a few Opus/WebM test tones are generated.
+
+Usage: python benchmarks/music_load_bench.py [--guilds 1,10,25,50] [--duration 30] [--mode opus] [--libopus path]
+"""
+import argparse
+import asyncio
+import glob
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import discord
+from config import Config
+from bot import MeowDowBot
+from utils.database import db
+from utils.audio_cache import audio_cache
+import cogs.music as music
+
+FRAME_SECONDS = 0.02
+# A frame is missed when it is sent more than one frame after its slot, enough for an audible gap
+MISS_TOLERANCE = FRAME_SECONDS
+
+def make_tones(directory: str, count: int, seconds: int) -> list:
+    """Opus/WebM tones of different pitches, what YouTube serves for most music"""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"tone{i}.webm")
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency={220 + 110 * i}:duration={seconds}",
+             "-ac", "2", "-ar", "48000", "-c:a", "libopus", "-b:a", "128k", path],
+            check=True,
+        )
+        paths.append(path)
+    return paths
+
+def bench_id(index: int) -> str:
+    """An 11 character YouTube-style video id, so bench tracks have audio cache keys"""
+    return f"bench{index:06d}"
+
+def track_url(index: int) -> str:
+    return f"https://youtu.be/{bench_id(index)}"
+
+def fill_cache(directory: str, files: list, tracks: int) -> int:
+    """Link every bench track to one of the files in an audio cache directory; returns the total size"""
+    os.makedirs(directory, exist_ok=True)
+    for index in range(tracks):
+        path = os.path.abspath(files[index % len(files)])
+        os.symlink(path, os.path.join(directory, bench_id(index) + os.path.splitext(path)[1]))
+    return sum(os.path.getsize(files[index % len(files)]) for index in range(tracks))
+
+class StubExtractor:
+    """Stands in for utils.ytdl.extractor; the audio is served by the audio cache"""
+
+    def __init__(self, duration: int = None):
+        self.duration = duration
+        self.lookups = 0
+
+    async def lookup(self, query: str, guild_id: int = 0, on_queued=None) -> dict:
+        self.lookups += 1
+        vid = query.rsplit("/", 1)[1]
+        return {
+            "id": vid,
+            "title": f"Track {int(vid[len('bench'):])}",
+            "webpage_url": query,
+            "duration": self.duration,
+            "extractor_key": "Youtube",
+        }
+
+    async def resolve_stream(self, url: str, valid_for: float = 0, guild_id: int = 0) -> dict:
+        raise RuntimeError(f"{url} is not in the bench audio cache")
+
+    def shutdown(self):
+        pass
+
+class Playback:
+    """One play() call: its source (swappable, like VoiceClient.source) and stop flag"""
+    __slots__ = ("source", "end")
+
+    def __init__(self, source):
+        self.source = source
+        self.end = threading.Event()
+
+class FakeVoiceClient:
+    """Plays sources into nothing on discord.py's 20 ms cadence, counting late frames"""
+
+    def __init__(self, guild, channel):
+        self.guild = guild
+        self.channel = channel
+        self.frames = 0
+        self.misses = 0
+        self._encoder = discord.opus.Encoder() if discord.opus.is_loaded() else None
+        self._playback = None
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    @property
+    def source(self):
+        return self._playback.source if self._playback else None
+
+    @source.setter
+    def source(self, value):
+        if self._playback is not None:
+            self._playback.source = value
+
+    def play(self, source, *, after=None):
+        playback = self._playback = Playback(source)
+        self._resumed.set()
+        threading.Thread(target=self._run, args=(playback, after), daemon=True).start()
+
+    def _run(self, playback: Playback, after):
+        """Same timing as AudioPlayer._do_run: frame n is due n * 20 ms after the start"""
+        loops, start = 0, time.perf_counter()
+        try:
+            while not playback.end.is_set():
+                if not self._resumed.is_set():
+                    self._resumed.wait()
+                    loops, start = 0, time.perf_counter()
+                    continue
+                source = playback.source
+                data = source.read()
+                if not data:
+                    break
+                if self._encoder is not None and not source.is_opus():
+                    self._encoder.encode(data, self._encoder.SAMPLES_PER_FRAME)
+                if time.perf_counter() > start + FRAME_SECONDS * loops + MISS_TOLERANCE:
+                    self.misses += 1
+                self.frames += 1
+                loops += 1
+                time.sleep(max(0.0, start + FRAME_SECONDS * loops - time.perf_counter()))
+        finally:
+            playback.source.cleanup()
+            if self._playback is playback:
+                self._playback = None
+            if after is not None:
+                after(None)
+
+    def is_connected(self) -> bool:
+        return True
+
+    def is_playing(self) -> bool:
+        return self._playback is not None and self._resumed.is_set()
+
+    def is_paused(self) -> bool:
+        return self._playback is not None and not self._resumed.is_set()
+
+    def pause(self):
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def stop(self):
+        """Ends playback without waiting; the thread cleans up and calls after, like VoiceClient.stop"""
+        if self._playback is not None:
+            self._playback.end.set()
+            self._playback = None
+        self._resumed.set()
+
+    async def disconnect(self, *, force: bool = False):
+        self.stop()
+        self.guild.voice_client = None
+
+class FakeVoiceChannel:
+    def __init__(self, guild):
+        self.guild = guild
+        self.id = guild.id * 10
+        self.mention = f"<#{self.id}>"
+        self.members = []
+
+    async def connect(self, *, self_deaf: bool = False):
+        self.guild.voice_client = FakeVoiceClient(self.guild, self)
+        self.guild.clients.append(self.guild.voice_client)
+        return self.guild.voice_client
+
+class FakeTextChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+
+class FakeVoiceState:
+    def __init__(self, channel):
+        self.channel = channel
+
+class FakeAvatar:
+    url = "https://cdn.discordapp.com/embed/avatars/0.png"
+
+class FakeMember:
+    def __init__(self, member_id: int, voice_channel):
+        self.id = member_id
+        self.bot = False
+        self.display_name = f"listener{member_id}"
+        self.display_avatar = FakeAvatar()
+        self.voice = FakeVoiceState(voice_channel)
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.voice_client = None
+        self.clients = []  # Every voice client this guild had, for frame counts
+        self.voice_channel = FakeVoiceChannel(self)
+        self.text_channel = FakeTextChannel(guild_id * 10 + 1)
+        self.member = FakeMember(guild_id * 100, self.voice_channel)
+        self.voice_channel.members.append(self.member)
+
+def ffmpeg_processes() -> int:
+    """ffmpeg children of this process, from /proc (0 where that isn't available)"""
+    pid, count = str(os.getpid()), 0
+    for stat in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(stat) as f:
+                fields = f.read().rsplit(")", 1)
+            name = fields[0].split("(", 1)[1]
+            ppid = fields[1].split()[1]
+        except (OSError, IndexError):
+            continue
+        if ppid == pid and name == "ffmpeg":
+            count += 1
+    return count
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def cpu_seconds() -> float:
+    """CPU used by this process and its finished ffmpeg children"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+async def sample(samples: dict, stop: asyncio.Event, interval: float = 0.1):
+    """Event loop lag every interval, processes and memory every second"""
+    loop = asyncio.get_running_loop()
+    ticks = 0
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples["lag_ms"].append((loop.time() - start - interval) * 1000)
+        ticks += 1
+        if ticks % 10 == 0:
+            samples["ffmpeg"].append(ffmpeg_processes())
+            samples["rss_mb"].append(rss_mb())
+
+async def listener(cog, guild: FakeGuild, tracks: int, end: float, rng: random.Random, latencies: list):
+    """One guild's users: queue a few songs, then keep queueing, skipping and looking at the queue"""
+    loop = asyncio.get_running_loop()
+
+    async def timed(coro):
+        start = time.perf_counter()
+        await coro
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    async def play():
+        url = track_url(rng.randrange(tracks))
+        await cog.enqueue(guild, guild.member, guild.text_channel, url)
+
+    async def skip():
+        player = cog.players.get(guild.id)
+        if player is not None:
+            player.skip()
+
+    async def queue():
+        cog.queue_embed(guild.id)
+
+    for _ in range(3):
+        await timed(play())
+    while loop.time() < end:
+        await asyncio.sleep(rng.uniform(2, 8))
+        roll = rng.random()
+        await timed(play() if roll < 0.5 else skip() if roll < 0.7 else queue())
+
+async def run_step(cog, count: int, duration: int, tracks: int, rng: random.Random) -> dict:
+    guilds = [FakeGuild(guild_id) for guild_id in range(1, count + 1)]
+    samples = {"lag_ms": [], "ffmpeg": [], "rss_mb": []}
+    latencies = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample(samples, stop))
+
+    loop = asyncio.get_running_loop()
+    start_cpu, start = cpu_seconds(), time.perf_counter()
+    end = loop.time() + duration
+    await asyncio.gather(*(listener(cog, guild, tracks, end, rng, latencies) for guild in guilds))
+    for guild in guilds:
+        await cog.stop_player(guild)
+    wall = time.perf_counter() - start
+    cpu = cpu_seconds() - start_cpu
+    stop.set()
+    await sampler
+
+    frames = [sum(client.frames for client in guild.clients) for guild in guilds]
+    misses = [sum(client.misses for client in guild.clients) for guild in guilds]
+    lag = sorted(samples["lag_ms"])
+    return {
+        "guilds": count,
+        "lag_p50": statistics.median(lag) if lag else 0.0,
+        "lag_p99": lag[int(len(lag) * 0.99)] if lag else 0.0,
+        "lag_max": lag[-1] if lag else 0.0,
+        "cpu_pct": cpu / wall * 100,
+        "rss_mb": max(samples["rss_mb"], default=rss_mb()),
+        "ffmpeg": max(samples["ffmpeg"], default=0),
+        "frames": sum(frames),
+        "misses": sum(misses),
+        "worst_guild_misses": max(misses, default=0),
+        "command_p99_ms": sorted(latencies)[int(len(latencies) * 0.99)] if latencies else 0.0,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", default="1,10,25,50", help="comma-separated guild counts, one run each")
+    parser.add_argument("--duration", type=int, default=30, help="seconds per run")
+    parser.add_argument("--mode", choices=("opus", "pcm"), default=Config.MUSIC_PLAYBACK_MODE)
+    parser.add_argument("--files", nargs="*", help="audio files to play (default: generated test tones)")
+    parser.add_argument("--seconds", type=int, default=20, help="length of the generated tones")
+    parser.add_argument("--tracks", type=int, default=1000, help="distinct track URLs guilds pick from")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--libopus", help="path to libopus for encoding PCM frames (default: the system library)")
+    args = parser.parse_args()
+
+    Config.MUSIC_PLAYBACK_MODE = args.mode
+    try:
+        if args.libopus:
+            discord.opus.load_opus(args.libopus)
+        discord.opus.Encoder()  # Loads the system libopus if none was given
+    except (discord.opus.OpusNotLoaded, OSError):
+        pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.files:
+            files, music.extractor = args.files, StubExtractor()
+        else:
+            files, music.extractor = make_tones(tmp, 4, args.seconds), StubExtractor(duration=args.seconds)
+        # Every track is a cache hit, so the cog opens the files with its local-file ffmpeg options
+        audio_cache.directory = os.path.join(tmp, "audio_cache")
+        audio_cache.max_bytes = fill_cache(audio_cache.directory, files, args.tracks)
+        audio_cache.enabled = True
+
+        db.db_path = os.path.join(tmp, "bench.db")  # Saved queues go to a throwaway database
+        await db.connect()
+        bot = MeowDowBot()
+        await bot._async_setup_hook()  # Binds the event loop without logging in
+        cog = music.Music(bot)
+        await bot.add_cog(cog)
+
+        libopus = "libopus loaded" if discord.opus.is_loaded() else "libopus not loaded, PCM frames are not encoded"
+        print(f"{args.mode} playback, {args.duration}s per run, {libopus}\n")
+        print(f"{'guilds':>6} {'lag p50':>8} {'lag p99':>8} {'lag max':>8} {'CPU':>6} {'RSS':>7} {'ffmpeg':>6} "
+              f"{'frames':>8} {'missed':>7} {'worst':>6} {'cmd p99':>8}")
+        rng = random.Random(args.seed)
+        for count in (int(n) for n in args.guilds.split(",")):
+            r = await run_step(cog, count, args.duration, args.tracks, rng)
+            missed = r["misses"] / r["frames"] * 100 if r["frames"] else 0.0
+            print(
+                f"{r['guilds']:>6} {r['lag_p50']:>6.1f}ms {r['lag_p99']:>6.1f}ms {r['lag_max']:>6.1f}ms "
+                f"{r['cpu_pct']:>5.0f}% {r['rss_mb']:>5.0f}MB {r['ffmpeg']:>6} {r['frames']:>8} "
+                f"{missed:>6.2f}% {r['worst_guild_misses']:>6} {r['command_p99_ms']:>6.1f}ms"
+            )
+
+        await bot.remove_cog(cog.qualified_name)
+        await db.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
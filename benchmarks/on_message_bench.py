@@ -0,0 +1,125 @@
+"""
+on_message throughput benchmark
+Feeds synthetic chat through MeowDowBot.on_message with the command fast path off and on
+
+Usage: python benchmarks/on_message_bench.py [--messages 50000] [--command-ratio 0.01]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # bot.py loads cogs/ and logs to data/ relative to the working directory
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from config import Config
+from bot import MeowDowBot
+
+CHAT = (
+    "lol", "gg", "anyone up for a game?", "that song slaps", "brb", "good morning everyone",
+    "did you see the new update", "meow", "what time is the event", "nice one",
+    "I think the bot is down again", "hahaha", "send the link pls", "same", "ok",
+)
+
+class FakeUser:
+    __slots__ = ("id", "bot", "mention", "name")
+
+    def __init__(self, user_id: int, bot: bool = False):
+        self.id = user_id
+        self.bot = bot
+        self.mention = f"<@{user_id}>"
+        self.name = f"user{user_id}"
+
+class FakeGuild:
+    __slots__ = ("id",)
+
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+class FakeChannel:
+    __slots__ = ("id", "sent")
+
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+
+class FakeMessage:
+    __slots__ = ("id", "content", "author", "guild", "channel", "_state")
+
+    def __init__(self, message_id, content, author, guild, channel, state):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.guild = guild
+        self.channel = channel
+        self._state = state
+
+def make_messages(bot, count: int, command_ratio: float, rng: random.Random) -> list:
+    guilds = [FakeGuild(guild_id) for guild_id in range(1, 51)]
+    channels = [FakeChannel(channel_id) for channel_id in range(1000, 1100)]
+    users = [FakeUser(user_id) for user_id in range(10_000, 30_000)]
+    messages = []
+    for message_id in range(count):
+        if rng.random() < command_ratio:
+            # Prefixed but not a real command, so nothing reaches the network
+            content = Config.PREFIX + rng.choice(("hmm", "...", "idk what this does", "lmao"))
+        else:
+            content = rng.choice(CHAT)
+        messages.append(FakeMessage(
+            message_id, content, rng.choice(users), rng.choice(guilds), rng.choice(channels), bot._connection
+        ))
+    return messages
+
+async def run(bot, messages: list, fast_path: bool) -> float:
+    Config.COMMAND_FAST_PATH = fast_path
+    for stage in bot.pipeline.stages:
+        stage.histogram.__init__()
+
+    start = time.perf_counter()
+    for message in messages:
+        await bot.on_message(message)
+    elapsed = time.perf_counter() - start
+
+    rate = len(messages) / elapsed
+    label = "fast path" if fast_path else "baseline"
+    print(f"\n{label:<10} {rate:12,.0f} msg/s  ({elapsed * 1000:.0f} ms for {len(messages)} messages)")
+    for stage in bot.pipeline.report():
+        print(f"  {stage['name']:<10} mean {stage['mean_us']:8.2f} us  p99 <= {stage['p99_us']:.0f} us")
+    return rate
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--command-ratio", type=float, default=0.01, help="fraction of messages with the prefix")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Keep synthetic traffic from tripping the spam filter
+    Config.SPAM_THRESHOLD = 10 ** 6
+    Config.LEVEL_UP_MESSAGES = False
+
+    bot = MeowDowBot()
+    await bot._async_setup_hook()  # Binds the event loop without logging in
+    bot._connection.user = FakeUser(1, bot=True)
+    await bot.load_cogs()
+    print(f"{len(bot.commands)} prefix commands loaded")
+
+    messages = make_messages(bot, args.messages, args.command_ratio, random.Random(args.seed))
+    # Warm-up pass: afterwards every author is inside their XP cooldown, so both
+    # measured runs do the same work in the other stages
+    print("\nwarm-up:", end="")
+    await run(bot, messages, fast_path=False)
+    baseline = await run(bot, messages, fast_path=False)
+    fast = await run(bot, messages, fast_path=True)
+    print(f"\nspeedup: {fast / baseline:.2f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Playback CPU benchmark
+Plays the same Opus file through N concurrent sources in each playback mode and reports CPU per stream
+
+  pcm          ffmpeg decodes to PCM, volume scaled in Python, libopus encodes in the bot process
+  opus-filter  ffmpeg applies the volume and re-encodes to Opus (for comparison; the bot doesn't use it)
+  opus-copy    ffmpeg copies the Opus packets untouched (MUSIC_PLAYBACK_MODE=opus at 100% volume)
+
+Needs ffmpeg on PATH. Without --input a 60 s Opus/WebM test tone is generated.
+
+Usage: python benchmarks/playback_bench.py [--streams 8] [--input song.webm] [--seconds 60]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import discord
+
+FRAME_SECONDS = 0.02
+
+def make_input(path: str, seconds: int):
+    """A stereo 48 kHz Opus/WebM file, what YouTube serves for most music"""
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+         "-ac", "2", "-ar", "48000", "-c:a", "libopus", "-b:a", "128k", path],
+        check=True,
+    )
+
+def open_source(mode: str, path: str, volume: float) -> discord.AudioSource:
+    if mode == "pcm":
+        return discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(path, options="-vn"), volume)
+    if mode == "opus-filter":
+        return discord.FFmpegOpusAudio(path, options=f"-vn -af volume={volume:.2f}")
+    return discord.FFmpegOpusAudio(path, codec="copy", options="-vn")
+
+def play(source: discord.AudioSource, encoder, frames: list, index: int):
+    """Drain a source as fast as it produces frames, encoding PCM like the voice thread does"""
+    count = 0
+    while True:
+        data = source.read()
+        if not data:
+            break
+        if encoder is not None:
+            encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+        count += 1
+    source.cleanup()
+    frames[index] = count
+
+def cpu_seconds() -> float:
+    """CPU used by this process and its finished ffmpeg children"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def run(mode: str, path: str, streams: int, volume: float) -> dict:
+    sources = [open_source(mode, path, volume) for _ in range(streams)]
+    # One encoder per stream, as each voice client has its own
+    encoders = [discord.opus.Encoder() if mode == "pcm" else None for _ in range(streams)]
+    frames = [0] * streams
+    start_cpu, start = cpu_seconds(), time.perf_counter()
+    threads = [
+        threading.Thread(target=play, args=(source, encoder, frames, i))
+        for i, (source, encoder) in enumerate(zip(sources, encoders))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cpu = cpu_seconds() - start_cpu
+    audio = sum(frames) * FRAME_SECONDS
+    return {
+        "mode": mode,
+        "wall_s": time.perf_counter() - start,
+        "cpu_s": cpu,
+        "audio_s": audio,
+        "cpu_per_audio_s": cpu / audio if audio else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=8, help="concurrent sources per mode")
+    parser.add_argument("--input", help="audio file to play (default: generated test tone)")
+    parser.add_argument("--seconds", type=int, default=60, help="length of the generated tone")
+    parser.add_argument("--volume", type=float, default=0.5, help="volume for the pcm and opus-filter modes")
+    parser.add_argument("--libopus", help="path to libopus for the pcm mode (default: the system library)")
+    args = parser.parse_args()
+
+    modes = ["pcm", "opus-filter", "opus-copy"]
+    try:
+        if args.libopus:
+            discord.opus.load_opus(args.libopus)
+        discord.opus.Encoder()  # Loads the system libopus if none was given
+    except (discord.opus.OpusNotLoaded, OSError):
+        print("libopus not found, skipping the pcm mode")
+        modes.remove("pcm")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.input
+        if path is None:
+            path = os.path.join(tmp, "tone.webm")
+            make_input(path, args.seconds)
+
+        print(f"{args.streams} streams per mode\n")
+        results = [run(mode, path, args.streams, args.volume) for mode in modes]
+
+    for result in results:
+        per_stream = result["cpu_per_audio_s"] * 100
+        print(
+            f"{result['mode']:<12} {per_stream:6.2f}% of a core per stream  "
+            f"({result['cpu_s']:.2f} CPU s for {result['audio_s']:.0f} s of audio, {result['wall_s']:.2f} s wall)"
+        )
+    baseline = results[0]["cpu_per_audio_s"]
+    for result in results[1:]:
+        if result["cpu_per_audio_s"]:
+            print(f"\n{result['mode']} uses {result['cpu_per_audio_s'] / baseline:.2f}x the CPU of {results[0]['mode']}", end="")
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Bad word filter benchmark
+Compares better_profanity against the Aho-Corasick ProfanityMatcher on a synthetic corpus
+
+Usage: python benchmarks/profanity_bench.py [--words 3000] [--messages 5000] [--baseline-messages 200]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.profanity import ProfanityMatcher
+
+CHAT_WORDS = (
+    "the be to of and a in that have it for not on with he as you do at this but his by from "
+    "they we say her she or an will my one all would there their what so up out if about who "
+    "get which go me when make can like time no just him know take people into year your good "
+    "some could them see other than then now look only come its over think also back after use "
+    "two how our work first well way even new want because any these give day most us lol gg "
+    "music play queue skip server discord meow cat bot hello thanks nice"
+).split()
+
+def make_words(count: int, rng: random.Random) -> list:
+    """Random lowercase 'bad words' of realistic length"""
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))))
+    return sorted(words)
+
+def make_corpus(count: int, bad_words: list, rng: random.Random, bad_ratio: float) -> list:
+    """Chat-like messages, a fraction of which contain a listed word"""
+    corpus = []
+    for _ in range(count):
+        words = rng.choices(CHAT_WORDS, k=rng.randint(3, 40))
+        if rng.random() < bad_ratio:
+            words[rng.randrange(len(words))] = rng.choice(bad_words)
+        corpus.append(" ".join(words))
+    return corpus
+
+def run(name: str, check, corpus: list) -> float:
+    """Time check() over the corpus, returns seconds per message"""
+    start = time.perf_counter()
+    hits = sum(1 for message in corpus if check(message))
+    elapsed = time.perf_counter() - start
+    per_message_us = elapsed / len(corpus) * 1e6
+    print(f"{name:<18} {elapsed * 1000:9.1f} ms total  {per_message_us:9.2f} us/msg  "
+          f"{hits}/{len(corpus)} hits")
+    return elapsed / len(corpus)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=3000, help="size of the bad word list")
+    parser.add_argument("--messages", type=int, default=5000, help="size of the message corpus")
+    parser.add_argument("--baseline-messages", type=int, default=200,
+                        help="messages fed to better_profanity (it is slow on large lists)")
+    parser.add_argument("--bad-ratio", type=float, default=0.02, help="fraction of messages with a bad word")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bad_words = make_words(args.words, rng)
+    corpus = make_corpus(args.messages, bad_words, rng, args.bad_ratio)
+    print(f"{len(bad_words)} words, {len(corpus)} messages, avg {sum(map(len, corpus)) / len(corpus):.0f} chars")
+
+    start = time.perf_counter()
+    matcher = ProfanityMatcher(bad_words)
+    print(f"{'compile automaton':<18} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    fast = run("aho-corasick", matcher.contains, corpus)
+
+    try:
+        from better_profanity import profanity
+    except ImportError:
+        print("better_profanity not installed, skipping baseline")
+        return
+
+    start = time.perf_counter()
+    profanity.load_censor_words(bad_words)
+    print(f"{'load better_prof.':<18} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    slow = run("better_profanity", profanity.contains_profanity, corpus[:args.baseline_messages])
+    print(f"speedup: {slow / fast:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,28 @@ A feature-rich Discord bot with moderation, music, economy, leveling, and more!
 import discord
 from discord.ext import commands
 import asyncio
+import hashlib
+import json
 import logging
 import os
 import sys
-from collections import defaultdict
 import time
-from better_profanity import profanity
-import requests
+
+# Cold start is measured from here: imports + setup up to the cogs being loaded
+_IMPORT_STARTED = time.perf_counter()
+
 from aiohttp import web
 
 # Import configuration
 from config import Config
 from utils.database import db
+from utils.audio_cache import audio_cache
+from utils.leveling import LevelingEngine
+from utils.spam import SpamDetector
+from utils.pipeline import MessagePipeline
+from utils.command_trie import CommandTrie
+from utils.profanity import BadWordsLoader
+from utils.sharding import ShardMonitor, ClusterIPC
 
 # Setup logging
 # Ensure data directory exists for logs
@@ -40,29 +50,57 @@ intents.members = True
 intents.voice_states = True
 intents.message_content = True
 
-class MeowDowBot(commands.Bot):
+class MeowDowBot(commands.AutoShardedBot):
     """Custom Bot class"""
     
-    def __init__(self):
+    def __init__(self, shard_ids=None, shard_count=None, cluster_id=None, cluster_count=1, ipc_secret=""):
         super().__init__(
             command_prefix=self.get_prefix,
             intents=intents,
-            help_command=None  # We'll create a custom help command
+            help_command=None,  # We'll create a custom help command
+            shard_ids=shard_ids,
+            shard_count=shard_count if shard_count is not None else Config.SHARD_COUNT
         )
         self.start_time = time.time()
-        self.spam_detector = SpamDetector()
+        
+        # Cluster mode (launcher.py): this process runs shard_ids out of shard_count
+        self.cluster_id = cluster_id
+        self.ipc = ClusterIPC(cluster_id or 0, cluster_count, ipc_secret)
+        self.ipc.register("stats", self.cluster_stats)
+        self.shard_monitor = ShardMonitor(self)
+        self.spam_detector = SpamDetector(self)
+        self.leveling = LevelingEngine()
         self.bad_words_filter_enabled = True
         
+        # Last synced app command tree hash per scope ("global" or guild id)
+        self._synced_hashes = {}
+        
+        # Pre-dispatch fast path state, rebuilt lazily when commands change
+        self._command_trie = None
+        self._mention_prefixes = ()
+        
+        # Per-cog load timings in ms: extension name -> {"import", "setup", "total"}
+        self.cog_load_times = {}
+        
+        # Lets cog_unload tell a reload or shutdown from a plain unload
+        self.reloading = set()  # Extension names being reloaded
+        self.closing = False
+        
+        # on_message stages; cogs can add their own with self.bot.pipeline.add_stage
+        self.pipeline = MessagePipeline()
+        self.pipeline.add_stage("spam", self.spam_stage, priority=10)
+        self.pipeline.add_stage("bad_words", self.bad_words_stage, priority=20)
+        self.pipeline.add_stage("leveling", self.leveling_stage, priority=50)
+        self.pipeline.add_stage("commands", self.commands_stage, priority=1000)
+        
     async def get_prefix(self, message):
         """Get custom prefix for each server"""
         if not message.guild:
             return Config.PREFIX
         
-        try:
-            prefix = await db.get_server_prefix(message.guild.id)
-            return commands.when_mentioned_or(prefix)(self, message)
-        except:
-            return commands.when_mentioned_or(Config.PREFIX)(self, message)
+        # Served from the in-memory settings cache, no database round trip
+        prefix = db.get_cached_prefix(message.guild.id)
+        return commands.when_mentioned_or(prefix)(self, message)
     
     async def setup_hook(self):
         """Setup hook called when bot is starting"""
@@ -71,33 +109,94 @@ class MeowDowBot(commands.Bot):
         # Connect to database
         await db.connect()
         logger.info("Database connected")
+        
+        # Spam enforcement worker and persisted unmute schedule
+        await self.spam_detector.start()
+        
+        # Bad word filter: instant from the disk cache, network refresh in the background
+        cached = bad_words.load_cached()
+        logger.info(f"Loaded {cached} bad words from cache")
+        bad_words.start()
+        
+        # Warm the server settings cache used by get_prefix
+        loaded = await db.load_server_settings()
+        logger.info(f"Loaded settings for {loaded} servers")
+        for guild_id, settings in db.server_settings.items():
+            if settings.get("disabled_stages"):
+                self.pipeline.set_disabled(guild_id, settings["disabled_stages"].split(","))
 
-        # Start health check server
-        await self.start_health_server()
+        # Start health check server (one per deployment, not per cluster)
+        if not self.cluster_id:
+            await self.start_health_server()
+        
+        # Cross-cluster requests, e.g. the servers command
+        await self.ipc.start()
+        self.shard_monitor.start()
 
         
         # Load all cogs
         await self.load_cogs()
         
-        # Sync slash commands
+        # Sync slash commands globally, only if the command tree changed since the last sync.
+        # Guilds aren't known yet here; on_ready checks them.
+        self._synced_hashes = await db.get_command_hashes()
+        if self.cluster_id:
+            return  # Cluster 0 owns the global scope
         try:
-            # Sync to all guilds (Global Sync) - might take up to 1 hour
-            # synced = await self.tree.sync()
-            # logger.info(f"Synced {len(synced)} slash commands globally")
-            
-            # FAST SYNC: Sync to current guilds immediately
-            for guild in self.guilds:
-                try:
-                    synced = await self.tree.sync(guild=guild)
-                    logger.info(f"Synced {len(synced)} commands to guild {guild.id}")
-                except Exception as e:
-                    logger.warning(f"Failed to sync to guild {guild.id}: {e}")
-            
-            # Also do a global sync just in case
-            await self.tree.sync()
-            
+            synced = await self.sync_scope()
+            if synced is None:
+                logger.info("Global slash commands unchanged, skipping sync")
+            else:
+                logger.info(f"Synced {len(synced)} slash commands globally")
         except Exception as e:
             logger.error(f"Failed to sync commands: {e}")
+    
+    def command_tree_hash(self, guild=None) -> str:
+        """Stable hash of the app commands registered for a scope"""
+        payload = []
+        for command in self.tree.get_commands(guild=guild):
+            try:
+                payload.append(command.to_dict(self.tree))
+            except TypeError:
+                payload.append(command.to_dict())  # discord.py < 2.4
+        payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    
+    async def sync_scope(self, guild=None, force: bool = False):
+        """Sync one scope if its command tree hash changed, returns None when skipped"""
+        scope = "global" if guild is None else str(guild.id)
+        digest = self.command_tree_hash(guild)
+        stored = self._synced_hashes.get(scope)
+        
+        if not force:
+            if stored == digest:
+                return None
+            if stored is None and guild is not None and not self.tree.get_commands(guild=guild):
+                # Never synced and nothing guild-specific to push, so nothing to do
+                self._synced_hashes[scope] = digest
+                return None
+        
+        synced = await self.tree.sync(guild=guild)
+        await db.set_command_hash(scope, digest)
+        self._synced_hashes[scope] = digest
+        return synced
+    
+    async def sync_commands(self, force: bool = False):
+        """Sync the global scope and every guild whose command tree changed"""
+        synced = skipped = 0
+        # Every cluster syncs its own guilds, only cluster 0 the global scope
+        scopes = self.guilds if self.cluster_id else [None, *self.guilds]
+        for guild in scopes:
+            try:
+                result = await self.sync_scope(guild, force)
+            except Exception as e:
+                logger.warning(f"Failed to sync {'global' if guild is None else guild.id} commands: {e}")
+                continue
+            if result is None:
+                skipped += 1
+            else:
+                synced += 1
+        logger.info(f"Command sync: {synced} scopes synced, {skipped} unchanged")
 
     async def start_health_server(self):
         """Start a simple web server for health checks"""
@@ -117,23 +216,80 @@ class MeowDowBot(commands.Bot):
 
     
     async def load_cogs(self):
-        """Load all cog files"""
-        cogs_dir = "cogs"
-        if not os.path.exists(cogs_dir):
-            logger.warning(f"Cogs directory '{cogs_dir}' not found")
+        """Load all cog files concurrently, timing each one"""
+        names = cog_names()
+        if not names:
+            logger.warning("No cogs found in 'cogs'")
             return
         
-        for filename in os.listdir(cogs_dir):
-            if filename.endswith(".py") and not filename.startswith("__"):
-                cog_name = filename[:-3]
-                try:
-                    await self.load_extension(f"cogs.{cog_name}")
-                    logger.info(f"Loaded cog: {cog_name}")
-                except Exception as e:
-                    logger.error(f"Failed to load cog {cog_name}: {e}")
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self.load_cog(name) for name in names), return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to load cog {name}: {result}")
+                continue
+            timings = self.cog_load_times[f"cogs.{name}"]
+            logger.info(
+                f"Loaded cog: {name} in {timings['total']:.1f} ms "
+                f"(import {timings['import']:.1f} ms, setup {timings['setup']:.1f} ms)"
+            )
+        
+        elapsed = (time.perf_counter() - start) * 1000
+        cold_start = (time.perf_counter() - _IMPORT_STARTED) * 1000
+        logger.info(f"Loaded {len(self.extensions)}/{len(names)} cogs in {elapsed:.1f} ms, cold start {cold_start:.0f} ms")
+        if cold_start > Config.COLD_START_TARGET_MS:
+            logger.warning(
+                f"Cold start over target ({cold_start:.0f} ms > {Config.COLD_START_TARGET_MS} ms), "
+                f"run `python bot.py --profile-imports` to see where the time goes"
+            )
+    
+    async def load_cog(self, name: str):
+        """Load one cog and record its import and setup time"""
+        extension = f"cogs.{name}"
+        timings = self.cog_load_times[extension] = {"import": 0.0, "setup": 0.0, "total": 0.0}
+        start = time.perf_counter()
+        try:
+            await self.load_extension(extension)
+        except Exception:
+            del self.cog_load_times[extension]
+            raise
+        # add_cog records the setup part, everything before it is importing the module
+        timings["total"] = (time.perf_counter() - start) * 1000
+        timings["import"] = timings["total"] - timings["setup"]
+    
+    async def reload_extension(self, name, *, package=None):
+        self.reloading.add(name)
+        try:
+            await super().reload_extension(name, package=package)
+        finally:
+            self.reloading.discard(name)
+    
+    async def add_cog(self, cog, /, **kwargs):
+        start = time.perf_counter()
+        await super().add_cog(cog, **kwargs)
+        timings = self.cog_load_times.get(cog.__module__)
+        if timings is not None:
+            timings["setup"] += (time.perf_counter() - start) * 1000
+    
+    async def cluster_stats(self) -> dict:
+        """Guild and shard summary of this process (served over IPC)"""
+        guilds = sorted(self.guilds, key=lambda guild: guild.member_count or 0, reverse=True)
+        return {
+            "cluster_id": self.cluster_id or 0,
+            "shard_ids": sorted(self.shards),
+            "guild_count": len(guilds),
+            "member_count": sum(guild.member_count or 0 for guild in guilds),
+            "top_guilds": [
+                {"id": guild.id, "name": guild.name, "member_count": guild.member_count or 0}
+                for guild in guilds[:10]
+            ],
+            "shards": self.shard_monitor.report(),
+        }
     
     async def on_ready(self):
         """Called when bot is ready"""
+        if self.cluster_id is not None:
+            logger.info(f"Cluster {self.cluster_id} ready with shards {sorted(self.shards)}")
         logger.info(f"Bot is ready! Logged in as {self.user}")
         logger.info(f"Bot ID: {self.user.id}")
         logger.info(f"Servers: {len(self.guilds)}")
@@ -147,21 +303,8 @@ class MeowDowBot(commands.Bot):
             )
         )
         
-        # Auto-sync commands to all servers
-        logger.info("Auto-syncing commands...")
-        for guild in self.guilds:
-            try:
-                synced = await self.tree.sync(guild=guild)
-                logger.info(f"Synced {len(synced)} commands to guild: {guild.name}")
-            except Exception as e:
-                logger.warning(f"Failed to sync to {guild.name}: {e}")
-        
-        # Global sync
-        try:
-            await self.tree.sync()
-            logger.info("Global sync complete")
-        except Exception as e:
-            logger.error(f"Global sync failed: {e}")
+        # Sync only the scopes whose command tree changed (on_ready also fires on reconnects)
+        await self.sync_commands()
     
     async def on_message(self, message):
         """Called when a message is received"""
@@ -169,25 +312,77 @@ class MeowDowBot(commands.Bot):
         if message.author.bot:
             return
         
-        # Check for spam
-        is_spam = await self.spam_detector.check_spam(message)
-        if is_spam:
-            return
+        await self.pipeline.run(message)
+    
+    # Message pipeline stages (return True to stop processing the message)
+    async def spam_stage(self, message):
+        """Check for spam"""
+        return await self.spam_detector.check_spam(message)
+    
+    async def bad_words_stage(self, message):
+        """Check for bad words"""
+        if not self.bad_words_filter_enabled or not contains_bad_word(message.content):
+            return False
         
-        # Check for bad words
-        if self.bad_words_filter_enabled and contains_bad_word(message.content):
+        try:
+            await message.delete()
+            await message.channel.send(
+                f"{message.author.mention}, please watch your language!",
+                delete_after=5
+            )
+        except:
+            pass
+        return True
+    
+    async def leveling_stage(self, message):
+        """Award XP (in-memory, written to the database in batches)"""
+        if not message.guild:
+            return False
+        
+        new_level = self.leveling.process(message)
+        if new_level is not None and Config.LEVEL_UP_MESSAGES:
             try:
-                await message.delete()
                 await message.channel.send(
-                    f"{message.author.mention}, please watch your language!",
-                    delete_after=5
+                    f"🎉 {message.author.mention} reached level **{new_level}**!"
                 )
-            except:
+            except discord.HTTPException:
                 pass
-            return
-        
-        # Process commands
+        return False
+    
+    async def commands_stage(self, message):
+        """Process commands"""
+        if Config.COMMAND_FAST_PATH and not self.looks_like_command(message):
+            return True
         await self.process_commands(message)
+        return True
+    
+    def looks_like_command(self, message) -> bool:
+        """Cheap check for a known prefix followed by a known command, before any Context is built"""
+        content = message.content
+        prefix = db.get_cached_prefix(message.guild.id) if message.guild else Config.PREFIX
+        if content.startswith(prefix):
+            start = len(prefix)
+        else:
+            if self.user is None:
+                return True  # Not logged in yet, let discord.py decide
+            if not self._mention_prefixes:
+                self._mention_prefixes = tuple(commands.when_mentioned(self, message))
+            if not content.startswith(self._mention_prefixes):
+                return False
+            start = next(len(p) for p in self._mention_prefixes if content.startswith(p))
+        
+        if self._command_trie is None:
+            self._command_trie = CommandTrie.from_bot(self)
+        return self._command_trie.match(content, start) is not None
+    
+    def add_command(self, command, /):
+        super().add_command(command)
+        self._command_trie = None
+    
+    def remove_command(self, name, /):
+        command = super().remove_command(name)
+        self._command_trie = None
+        return command
     
     async def on_command_error(self, ctx, error):
         """Global error handler"""
@@ -213,114 +408,51 @@ class MeowDowBot(commands.Bot):
     async def close(self):
         """Cleanup when bot is shutting down"""
         logger.info("Shutting down bot...")
-        await db.close()
-        await super().close()
-
-class SpamDetector:
-    """Spam detection system"""
-    
-    def __init__(self):
-        self.message_count = defaultdict(int)
-        self.last_reset = defaultdict(float)
-        self.muted_users = set()
-        self.user_messages = defaultdict(list)
-        self.THRESHOLD = Config.SPAM_THRESHOLD
-        self.TIME_WINDOW = Config.SPAM_TIME_WINDOW
-        self.MUTE_DURATION = Config.SPAM_MUTE_DURATION
-    
-    async def check_spam(self, message):
-        """Check if a message is spam"""
-        user_id = message.author.id
-        current_time = time.time()
-        
-        # Reset counter if time window has passed
-        if current_time - self.last_reset[user_id] > self.TIME_WINDOW:
-            self.message_count[user_id] = 0
-            self.last_reset[user_id] = current_time
-            self.user_messages[user_id] = []
-        
-        self.message_count[user_id] += 1
-        self.user_messages[user_id].append(message)
-        
-        # Check if threshold exceeded
-        if self.message_count[user_id] > self.THRESHOLD:
-            if user_id not in self.muted_users:
-                await self.mute_user(message)
-            return True
-        
-        return False
-    
-    async def mute_user(self, message):
-        """Mute a user for spamming"""
-        user_id = message.author.id
-        self.muted_users.add(user_id)
-        
+        self.closing = True
+        bad_words.stop()
+        self.spam_detector.stop()
+        self.shard_monitor.stop()
+        await self.ipc.stop()
+        await super().close()  # Unloads the cogs first, they may still write (e.g. music queues)
+        audio_cache.shutdown()
         try:
-            # Delete spam messages
-            for msg in self.user_messages[user_id]:
-                try:
-                    await msg.delete()
-                except:
-                    pass
-            
-            # Get or create muted role
-            muted_role = discord.utils.get(message.guild.roles, name="Muted")
-            if not muted_role:
-                muted_role = await message.guild.create_role(name="Muted")
-                for channel in message.guild.channels:
-                    await channel.set_permissions(
-                        muted_role,
-                        send_messages=False,
-                        add_reactions=False,
-                        speak=False
-                    )
-            
-            # Mute the user
-            await message.author.add_roles(muted_role)
-            await message.channel.send(
-                f"{message.author.mention} has been muted for {self.MUTE_DURATION} seconds due to spamming."
-            )
-            
-            # Wait and unmute
-            await asyncio.sleep(self.MUTE_DURATION)
-            await message.author.remove_roles(muted_role)
-            self.muted_users.remove(user_id)
-            await message.channel.send(f"{message.author.mention}'s mute has been lifted.")
-            
-        except discord.errors.Forbidden:
-            await message.channel.send("I don't have permission to mute users.")
+            flushed = await db.flush()
+            logger.info(f"Flushed {flushed} buffered profile updates")
         except Exception as e:
-            logger.error(f"Error muting user: {e}")
+            logger.error(f"Failed to flush database buffer: {e}")
+        await db.close()
 
 # Bad words filter
-def get_bad_words(url):
-    """Fetch bad words list from URL"""
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            words = response.text.split('\n')
-            return set(word.strip().lower() for word in words if word.strip())
-    except:
-        pass
-    return set()
-
-# Load bad words
-MAIN_BAD_WORDS_URL = "https://raw.githubusercontent.com/RobertJGabriel/Google-profanity-words/master/list.txt"
-CUSTOM_BAD_WORDS_URL = "https://raw.githubusercontent.com/phantom-exe/stock/main/custom_bad_words.txt"
-
-MAIN_BAD_WORDS = get_bad_words(MAIN_BAD_WORDS_URL)
-CUSTOM_BAD_WORDS = get_bad_words(CUSTOM_BAD_WORDS_URL)
-BAD_WORDS = MAIN_BAD_WORDS.union(CUSTOM_BAD_WORDS)
-profanity.load_censor_words(BAD_WORDS)
+# Served from the disk cache in data/ and refreshed in the background (see setup_hook)
+bad_words = BadWordsLoader(
+    Config.BAD_WORDS_URLS,
+    Config.BAD_WORDS_CACHE_DIR,
+    Config.BAD_WORDS_REFRESH_INTERVAL
+)
 
 def contains_bad_word(message):
     """Check if message contains bad words"""
-    return profanity.contains_profanity(message)
+    return bad_words.contains(message)
 
 # Main execution
-async def main():
-    """Main function to run the bot"""
-    bot = MeowDowBot()
+def cog_names() -> list:
+    """Names of the cog modules in cogs/"""
+    if not os.path.isdir("cogs"):
+        return []
+    return sorted(
+        filename[:-3] for filename in os.listdir("cogs")
+        if filename.endswith(".py") and not filename.startswith("__")
+    )
+
+def profile_imports():
+    """Print an -X importtime summary of the bot and its cogs"""
+    from utils.startup import profile_imports as run_profile, format_import_profile
+    modules = ["bot"] + [f"cogs.{name}" for name in cog_names()]
+    print(format_import_profile(run_profile(modules), Config.COLD_START_TARGET_MS))
+
+async def main(**bot_options):
+    """Main function to run the bot (launcher.py passes the cluster's shard options)"""
+    bot = MeowDowBot(**bot_options)
     
     try:
         await bot.start(Config.DISCORD_TOKEN)
@@ -332,6 +464,9 @@ async def main():
         await bot.close()
 
 if __name__ == "__main__":
+    if "--profile-imports" in sys.argv:
+        profile_imports()
+        sys.exit(0)
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
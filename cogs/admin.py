@@ -7,6 +7,7 @@ from discord.ext import commands
 from discord import app_commands
 from typing import Optional, Literal
 from utils.embeds import Embeds
+from utils.database import db
 from config import Config
 
 class Admin(commands.Cog):
@@ -19,26 +20,35 @@ class Admin(commands.Cog):
         """Check if user is the bot owner"""
         return user_id == Config.OWNER_ID or user_id == self.bot.owner_id
     
-    @commands.command(name="sync", help="Sync slash commands (Owner only)")
-    async def sync_prefix(self, ctx, scope: Optional[str] = None):
+    @commands.command(name="sync", help="Sync slash commands (Owner only), add 'force' to resync unchanged commands")
+    async def sync_prefix(self, ctx, scope: Optional[str] = None, force: Optional[str] = None):
         """Sync slash commands"""
         if not self.is_owner(ctx.author.id):
             await ctx.send("❌ This command is owner-only!")
             return
         
+        forced = "force" in (scope, force)
+        if scope == "force":
+            scope = None
+        
         try:
-            if scope == "guild" or scope == "server":
-                # Sync to current guild only (instant)
-                synced = await self.bot.tree.sync(guild=ctx.guild)
-                await ctx.send(f"✅ Synced {len(synced)} commands to this server!")
-            elif scope == "global":
+            if scope == "global":
                 # Sync globally (takes up to 1 hour)
-                synced = await self.bot.tree.sync()
-                await ctx.send(f"✅ Synced {len(synced)} commands globally (may take up to 1 hour to appear)")
+                synced = await self.bot.sync_scope(force=forced)
+                where = "globally (may take up to 1 hour to appear)"
+            elif scope == "all":
+                await self.bot.sync_commands(force=forced)
+                await ctx.send("✅ Synced every changed scope, see the logs for details.")
+                return
+            else:
+                # Sync to current guild (instant)
+                synced = await self.bot.sync_scope(guild=ctx.guild, force=forced)
+                where = "to this server"
+            
+            if synced is None:
+                await ctx.send("✅ Commands are already up to date. Use `sync <scope> force` to resync anyway.")
             else:
-                # Sync to current guild by default
-                synced = await self.bot.tree.sync(guild=ctx.guild)
-                await ctx.send(f"✅ Synced {len(synced)} commands to this server!")
+                await ctx.send(f"✅ Synced {len(synced)} commands {where}!")
         except Exception as e:
             await ctx.send(f"❌ Failed to sync: {e}")
     
@@ -98,17 +108,86 @@ class Admin(commands.Cog):
             await ctx.send("❌ This command is owner-only!")
             return
         
-        guilds = self.bot.guilds
-        guild_list = "\n".join([f"• {guild.name} ({guild.id}) - {guild.member_count} members" for guild in guilds[:10]])
+        # One entry per cluster process (just this one unless started by launcher.py)
+        clusters = await self.bot.ipc.gather("stats")
+        guild_count = sum(cluster["guild_count"] for cluster in clusters)
+        member_count = sum(cluster["member_count"] for cluster in clusters)
+        top = sorted(
+            (guild for cluster in clusters for guild in cluster["top_guilds"]),
+            key=lambda guild: guild["member_count"], reverse=True
+        )[:10]
+        guild_list = "\n".join([f"• {guild['name']} ({guild['id']}) - {guild['member_count']} members" for guild in top])
         
-        if len(guilds) > 10:
-            guild_list += f"\n\n...and {len(guilds) - 10} more"
+        if guild_count > 10:
+            guild_list += f"\n\n...and {guild_count - 10} more"
         
         embed = Embeds.info(
             guild_list,
-            title=f"Servers ({len(guilds)})"
+            title=f"Servers ({guild_count})"
         )
+        footer = f"{member_count} members"
+        if self.bot.ipc.enabled:
+            footer += f" · {len(clusters)}/{self.bot.ipc.cluster_count} clusters responding"
+        embed.set_footer(text=footer)
+        await ctx.send(embed=embed)
+    
+    @commands.command(name="shards", help="Show per-shard latency and event rate (Owner only)")
+    async def shards_prefix(self, ctx):
+        """Show per-shard stats across all clusters"""
+        if not self.is_owner(ctx.author.id):
+            await ctx.send("❌ This command is owner-only!")
+            return
+        
+        lines = []
+        for cluster in await self.bot.ipc.gather("stats"):
+            for shard in cluster["shards"]:
+                latency = f"{shard['latency_ms']:.0f}ms" if shard["latency_ms"] is not None else "n/a"
+                status = " · closed" if shard["closed"] else ""
+                lines.append(
+                    f"**Shard {shard['shard_id']}** (cluster {cluster['cluster_id']}) · {latency} · "
+                    f"{shard['events_per_s']:.1f} events/s · {shard['guilds']} servers{status}"
+                )
+        embed = Embeds.info("\n".join(lines) or "No shards running", title=f"Shards ({len(lines)})")
+        await ctx.send(embed=embed)
+
+    @commands.command(name="pipeline", help="Show message pipeline stage timings (Owner only)")
+    async def pipeline_prefix(self, ctx):
+        """Show per-stage latency of the on_message pipeline"""
+        if not self.is_owner(ctx.author.id):
+            await ctx.send("❌ This command is owner-only!")
+            return
+        
+        lines = []
+        for stage in self.bot.pipeline.report():
+            lines.append(
+                f"**{stage['name']}** (priority {stage['priority']})\n"
+                f"calls {stage['count']} · stops {stage['stops']} · errors {stage['errors']}\n"
+                f"mean {stage['mean_us']:.0f}µs · p50 ≤{stage['p50_us']:.0f}µs · "
+                f"p99 ≤{stage['p99_us']:.0f}µs · max {stage['max_us']:.0f}µs · total {stage['total_ms']:.0f}ms"
+            )
+        embed = Embeds.info("\n\n".join(lines) or "No stages registered", title="Message Pipeline")
         await ctx.send(embed=embed)
+    
+    @commands.command(name="stage", help="Enable or disable a message stage for this server")
+    @commands.has_permissions(manage_guild=True)
+    async def stage_prefix(self, ctx, name: str, state: Literal["on", "off"]):
+        """Toggle a message pipeline stage for this server"""
+        stages = {stage.name for stage in self.bot.pipeline.stages}
+        if name not in stages:
+            await ctx.send(f"❌ Unknown stage. Available: {', '.join(sorted(stages))}")
+            return
+        if name == "commands":
+            await ctx.send("❌ The commands stage can't be disabled.")
+            return
+        
+        disabled = self.bot.pipeline.disabled_for(ctx.guild.id)
+        if state == "off":
+            disabled.add(name)
+        else:
+            disabled.discard(name)
+        await db.set_server_setting(ctx.guild.id, "disabled_stages", ",".join(sorted(disabled)) or None)
+        self.bot.pipeline.set_disabled(ctx.guild.id, disabled)
+        await ctx.send(f"✅ Stage `{name}` is now **{state}** for this server.")
 
 async def setup(bot):
     await bot.add_cog(Admin(bot))
@@ -7,6 +7,7 @@ from discord.ext import commands
 from discord import app_commands
 from utils.embeds import Embeds
 from utils.database import db
+from config import Config
 from typing import Optional
 
 class Moderation(commands.Cog):
@@ -143,5 +144,37 @@ class Moderation(commands.Cog):
         deleted = await interaction.channel.purge(limit=amount)
         await interaction.followup.send(f"🧹 Deleted {len(deleted)} messages.", ephemeral=True)
 
+    # ANTI-SPAM SETTINGS
+    async def set_spam_limits(self, guild_id: int, threshold: Optional[int], window: Optional[int]) -> discord.Embed:
+        if threshold is not None and threshold < 1 or window is not None and window < 1:
+            return Embeds.error("Threshold and window must be at least 1.")
+        
+        # None clears the override so the global defaults apply again
+        await db.set_server_setting(guild_id, "spam_threshold", threshold)
+        await db.set_server_setting(guild_id, "spam_time_window", window)
+        threshold, window = self.bot.spam_detector.get_limits(guild_id)
+        return Embeds.success(
+            f"Members are limited to **{threshold}** messages per **{window}s**.",
+            title="Anti-Spam Updated"
+        )
+
+    @commands.command(name="antispam", help="Set the spam limit (messages per seconds), no arguments to reset")
+    @commands.has_permissions(manage_guild=True)
+    async def antispam_prefix(self, ctx, threshold: Optional[int] = None, window: Optional[int] = None):
+        """Set the spam limit"""
+        embed = await self.set_spam_limits(ctx.guild.id, threshold, window)
+        await ctx.send(embed=embed)
+
+    @app_commands.command(name="antispam", description="Set the spam limit, leave empty to reset")
+    @app_commands.describe(
+        threshold=f"Messages allowed per window (default {Config.SPAM_THRESHOLD})",
+        window=f"Window length in seconds (default {Config.SPAM_TIME_WINDOW})"
+    )
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def antispam_slash(self, interaction: discord.Interaction, threshold: Optional[int] = None, window: Optional[int] = None):
+        """Set the spam limit"""
+        embed = await self.set_spam_limits(interaction.guild.id, threshold, window)
+        await interaction.response.send_message(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Moderation(bot))
@@ -6,87 +6,342 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import asyncio
-import yt_dlp
+import functools
+import logging
 from utils.embeds import Embeds
+from utils.player import GuildPlayer, Track
+from utils.ytdl import extractor, ExtractorBusy, PlaylistCursor, is_playlist_url
+from utils.audio_cache import audio_cache
+from utils.voice_reaper import VoiceReaper
+from utils.queue_store import QueueStore
+from utils.database import db
 from config import Config
-from typing import Optional
-
-# YTDL Options
-YTDL_OPTIONS = {
-    'format': 'bestaudio/best',
-    'extractaudio': True,
-    'audioformat': 'mp3',
-    'outtmpl': 'data/%(extractor)s-%(id)s-%(title)s.%(ext)s',
-    'restrictfilenames': True,
-    'noplaylist': True,
-    'nocheckcertificate': True,
-    'ignoreerrors': False,
-    'logtostderr': False,
-    'quiet': True,
-    'no_warnings': True,
-    'default_search': 'auto',
-    'source_address': '0.0.0.0',
-}
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
 
 FFMPEG_OPTIONS = {
     'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
     'options': '-vn',
 }
 
-ytdl = yt_dlp.YoutubeDL(YTDL_OPTIONS)
+# discord.py reads 20 ms of audio per frame in both modes
+FRAME_SECONDS = 0.02
+
+def ffmpeg_options(local: bool, offset: float = 0.0) -> dict:
+    """ffmpeg arguments for a stream or cached file, seeking to offset seconds"""
+    # The reconnect flags only apply to network inputs
+    before = [] if local else [FFMPEG_OPTIONS['before_options']]
+    if offset:
+        before.append(f"-ss {offset:.2f}")
+    return {'before_options': " ".join(before), 'options': FFMPEG_OPTIONS['options']}
+
+def default_volume() -> float:
+    """Starting volume of a new player; 100% in opus mode, the only volume Opus streams are passed through at"""
+    return 1.0 if Config.MUSIC_PLAYBACK_MODE == "opus" else Config.MUSIC_DEFAULT_VOLUME
 
 class YTDLSource(discord.PCMVolumeTransformer):
-    def __init__(self, source, *, data, volume=0.5):
+    """PCM playback: ffmpeg decodes, the volume is applied per frame here and discord.py encodes to Opus"""
+
+    def __init__(self, source, *, data, volume=0.5, offset=0.0):
         super().__init__(source, volume)
         self.data = data
         self.title = data.get('title')
         self.url = data.get('url')
         self.duration = data.get('duration')
+        self.offset = offset
+        self.frames = 0
+
+    def read(self) -> bytes:
+        data = super().read()
+        if data:
+            self.frames += 1
+        return data
+
+    @property
+    def position(self) -> float:
+        return self.offset + self.frames * FRAME_SECONDS
 
     @classmethod
-    async def from_url(cls, url, *, loop=None, stream=False):
-        loop = loop or asyncio.get_event_loop()
-        data = await loop.run_in_executor(None, lambda: ytdl.extract_info(url, download=not stream))
+    def from_track(cls, track: Track, *, volume=Config.MUSIC_DEFAULT_VOLUME, path: Optional[str] = None, offset: float = 0.0):
+        """Open an already resolved track without another extraction, or its cached file"""
+        source = path or track.stream_url
+        data = {'title': track.title, 'url': source, 'duration': track.duration, 'webpage_url': track.url}
+        audio = discord.FFmpegPCMAudio(source, **ffmpeg_options(path is not None, offset))
+        return cls(audio, data=data, volume=volume, offset=offset)
+
+class YTDLOpusSource(discord.FFmpegOpusAudio):
+    """Opus passthrough: ffmpeg copies the stream's Opus packets and they are sent as they are.
+
+    Nothing is decoded or encoded, so the volume can't change; the player reopens the
+    track as a YTDLSource at the current position when it does.
+    """
+
+    def __init__(self, source: str, *, data, offset=0.0, local=False):
+        super().__init__(source, codec='copy', **ffmpeg_options(local, offset))
+        self.data = data
+        self.title = data.get('title')
+        self.url = data.get('url')
+        self.duration = data.get('duration')
+        self.offset = offset
+        self.frames = 0
+
+    def read(self) -> bytes:
+        data = super().read()
+        if data:
+            self.frames += 1
+        return data
 
-        if 'entries' in data:
-            # take first item from a playlist
-            data = data['entries'][0]
+    @property
+    def position(self) -> float:
+        return self.offset + self.frames * FRAME_SECONDS
 
-        filename = data['url'] if stream else ytdl.prepare_filename(data)
-        return cls(discord.FFmpegPCMAudio(filename, **FFMPEG_OPTIONS), data=data)
+    @classmethod
+    def from_track(cls, track: Track, *, path: Optional[str] = None, offset: float = 0.0):
+        source = path or track.stream_url
+        data = {'title': track.title, 'url': source, 'duration': track.duration, 'webpage_url': track.url}
+        return cls(source, data=data, offset=offset, local=path is not None)
+
+async def probe_codec(track: Track, path: Optional[str] = None) -> Optional[str]:
+    """Audio codec of a track's stream or cached file, running ffprobe only when the extractor didn't report one"""
+    if path is None and track.codec is not None:
+        return track.codec
+    codec = None
+    try:
+        codec, _ = await discord.FFmpegOpusAudio.probe(path or track.stream_url)
+    except Exception as e:
+        logger.warning(f"Codec probe failed for {track.url}: {e}")
+    if path is None:
+        track.codec = codec
+    return codec
 
 class Music(commands.Cog):
     """Music commands for playing songs"""
 
     def __init__(self, bot):
         self.bot = bot
-        self.queues = {} # Guild ID -> List of songs
-        self.current_song = {} # Guild ID -> Current song title
-
-    def get_queue(self, guild_id):
-        if guild_id not in self.queues:
-            self.queues[guild_id] = []
-        return self.queues[guild_id]
-
-    async def play_next(self, ctx):
-        if ctx.guild.id in self.queues and self.queues[ctx.guild.id]:
-            # Get next song
-            url, title = self.queues[ctx.guild.id].pop(0)
-            self.current_song[ctx.guild.id] = title
-            
-            async with ctx.typing():
-                try:
-                    player = await YTDLSource.from_url(url, loop=self.bot.loop, stream=True)
-                    ctx.voice_client.play(player, after=lambda e: asyncio.run_coroutine_threadsafe(self.play_next(ctx), self.bot.loop))
-                    
-                    embed = Embeds.music_now_playing(title, url, ctx.author)
-                    await ctx.send(embed=embed)
-                except Exception as e:
-                    await ctx.send(f"An error occurred playing the next song: {e}")
-                    self.current_song[ctx.guild.id] = None
-        else:
-            self.current_song[ctx.guild.id] = None
-            # Disconnect if queue is empty? Maybe not immediately.
+        self.players = {} # Guild ID -> GuildPlayer
+        self.reaper = VoiceReaper(bot, self.reap)
+        self.store = QueueStore(self.players)
+        self._restore_task: Optional[asyncio.Task] = None
+
+    def get_player(self, guild: discord.Guild, channel=None) -> GuildPlayer:
+        """Get or create the guild's player, remembering where to post now playing messages"""
+        player = self.players.get(guild.id)
+        if player is None:
+            player = self.players[guild.id] = GuildPlayer(
+                self.bot, guild, functools.partial(self.resolve, guild_id=guild.id),
+                functools.partial(self.create_source, guild_id=guild.id), channel,
+                volume=default_volume(), store=self.store,
+            )
+        elif channel is not None:
+            player.channel = channel
+        return player
+
+    async def resolve(self, track: Track, guild_id: int = 0):
+        """Look up a track's direct stream URL"""
+        if audio_cache.contains(track.url):
+            return  # Played from disk, no stream needed
+        valid_for = (track.duration or 0) + Config.MUSIC_STREAM_REFRESH_MARGIN
+        stream = await extractor.resolve_stream(track.url, valid_for, guild_id)
+        track.set_stream(stream['url'], stream['acodec'])
+        track.duration = stream['duration'] or track.duration
+
+    async def create_source(self, track: Track, volume: float, offset: float = 0.0, guild_id: int = 0) -> discord.AudioSource:
+        """Open a resolved track with ffmpeg, from the local audio cache when possible"""
+        # Reopens after a volume change start mid-track and aren't new plays
+        path = await audio_cache.lookup(track.url, count=not offset)
+        if path is None:
+            if not offset:
+                audio_cache.record_play(track.url, track.duration)
+            if track.stream_url is None:
+                await self.resolve(track, guild_id=guild_id)
+
+        # Re-encoding in ffmpeg to apply a volume costs more CPU than the PCM path,
+        # so opus mode only passes Opus through at 100% and uses PCM otherwise
+        if Config.MUSIC_PLAYBACK_MODE == "opus" and volume == 1.0 and await probe_codec(track, path) == 'opus':
+            return YTDLOpusSource.from_track(track, path=path, offset=offset)
+        return YTDLSource.from_track(track, volume=volume, path=path, offset=offset)
+
+    async def cog_load(self):
+        # Voice clients survive a cog reload, keep reaping them
+        for voice_client in self.bot.voice_clients:
+            self.reaper.watch(voice_client.guild.id, voice_client.channel)
+        self.reaper.start()
+        self.store.start()
+        self._restore_task = asyncio.create_task(self.restore_players())
+        if audio_cache.enabled:
+            files = await asyncio.to_thread(audio_cache.load)
+            logger.info(f"Audio cache: {files} files, {audio_cache.bytes / 1024 ** 2:.0f} MB")
+
+    async def cog_unload(self):
+        self.reaper.stop()
+        if self._restore_task is not None:
+            self._restore_task.cancel()
+        reloading = self.__module__ in self.bot.reloading
+        if not reloading and not self.bot.closing:
+            for guild_id in self.players:
+                self.store.drop(guild_id)  # Unloaded for good: nothing to resume
+        await self.store.close()  # Saved before the players go, so they are restored on the next load
+        for player in self.players.values():
+            # On a reload, stay connected: the next load resumes on the same voice client,
+            # and no disconnect event arrives late to make it drop the saved session
+            await player.destroy(disconnect=not reloading)
+        self.players.clear()
+        if not reloading:
+            for voice_client in list(self.bot.voice_clients):
+                await voice_client.disconnect(force=True)  # No player, e.g. joined with /join
+        extractor.shutdown()
+
+    async def restore_players(self):
+        """Rejoin voice and requeue what was playing before a restart or reload"""
+        await self.bot.wait_until_ready()
+        sessions = [row for row in await db.get_music_sessions() if self.bot.get_guild(row['guild_id']) is not None]
+        if not sessions:
+            return
+        results = await asyncio.gather(
+            *(self.restore_player(self.bot.get_guild(row['guild_id']), row) for row in sessions),
+            return_exceptions=True,
+        )
+        for row, result in zip(sessions, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to restore music in guild {row['guild_id']}: {result}")
+                self.store.drop(row['guild_id'])
+        restored = sum(1 for result in results if result is True)
+        logger.info(f"Restored {restored}/{len(sessions)} music sessions")
+
+    async def restore_player(self, guild: discord.Guild, session) -> bool:
+        """Requeue one guild's saved tracks; they are resolved when they come up, not here"""
+        rows = await db.get_music_queue(guild.id)
+        player = self.players.get(guild.id)
+        if player is not None:
+            # Someone started playing already; their queue replaces the saved one
+            live = {track.seq for track in (player.current, *player.queue) if track is not None}
+            self.store.remove_rows(guild.id, [row['seq'] for row in rows if row['seq'] not in live])
+            return False
+        # After a reload the voice client is still connected, possibly moved since the save
+        voice_client = guild.voice_client
+        voice_channel = voice_client.channel if voice_client is not None else guild.get_channel(session['voice_channel_id'])
+        if voice_channel is None or not rows or not any(not member.bot for member in voice_channel.members):
+            self.store.drop(guild.id)
+            return False
+
+        if voice_client is None:
+            await voice_channel.connect(self_deaf=True)
+        player = self.get_player(guild, guild.get_channel(session['text_channel_id']))
+        player.volume = session['volume']
+        tracks = []
+        for row in rows:
+            # The requester may have left; restored tracks play without one
+            requester = guild.get_member(row['requester_id']) if row['requester_id'] else None
+            track = Track(row['url'], row['title'], requester, row['duration'])
+            track.seq = row['seq']
+            tracks.append(track)
+        offset = session['position'] if rows[0]['seq'] == session['current_seq'] else 0.0
+        player.restore(tracks, offset)
+        await player.announce(f"🔁 Picking up where I left off: **{tracks[0].title}** and {len(tracks) - 1} more.")
+        return True
+
+    async def enqueue(self, guild: discord.Guild, member: discord.Member, channel, query: str) -> Union[str, discord.Embed]:
+        """Connect if needed, resolve the query and queue it; returns the reply for the user"""
+        if not guild.voice_client:
+            if member.voice:
+                await member.voice.channel.connect(self_deaf=True)
+            else:
+                return "❌ You need to be in a voice channel!"
+
+        self.reaper.touch(guild.id)
+        player = self.get_player(guild, channel)
+        if len(player.queue) >= player.max_size:
+            return f"❌ The queue is full ({player.max_size} songs)."
+
+        async def on_queued(position: int):
+            await channel.send(f"⏳ Lots of music requests right now, yours is #{position} in line...")
+
+        if is_playlist_url(query):
+            return await self.enqueue_playlist(player, member, query)
+
+        # Basic search if not a URL
+        if not query.startswith("http"):
+            query = f"ytsearch:{query}"
+
+        # Metadata (and usually the stream URL) from the extractor cache or yt-dlp
+        try:
+            info = await extractor.lookup(query, guild.id, on_queued)
+        except ExtractorBusy as e:
+            return f"⏳ {e}"
+        track = Track(info['webpage_url'], info['title'], member, info.get('duration'))
+        if info.get('url'):
+            track.set_stream(info['url'], info['acodec'])  # Already resolved by the lookup, no second extraction
+        was_active = player.is_active
+        position = player.enqueue(track)
+        if position is None:
+            return f"❌ The queue is full ({player.max_size} songs)."
+        if was_active:
+            return Embeds.music_added_to_queue(track.title, position)
+        return f"🎶 Loading **{track.title}**..."
+
+    def add_entries(self, player: GuildPlayer, member: discord.Member, entries: list) -> int:
+        """Queue flat playlist entries (resolved later by the player), returns how many fit"""
+        added = 0
+        for entry in entries:
+            if player.enqueue(Track(entry["url"], entry["title"], member, entry["duration"])) is None:
+                break
+            added += 1
+        return added
+
+    async def enqueue_playlist(self, player: GuildPlayer, member: discord.Member, url: str) -> str:
+        """Queue the first few playlist entries right away and stream the rest in the background"""
+        first_page = Config.MUSIC_PLAYLIST_FIRST_PAGE
+        cursor = PlaylistCursor(url)  # One listing pass for the whole playlist
+        try:
+            page = await extractor.playlist_page(cursor, first_page, player.guild.id)
+        except ExtractorBusy as e:
+            return f"⏳ {e}"
+        if not page["entries"]:
+            return "❌ That playlist is empty or private."
+
+        title = page["title"] or "playlist"
+        added = self.add_entries(player, member, page["entries"])
+        if page["listed"] < first_page or not player.free_slots:
+            return f"📃 Queued **{added}** tracks from **{title}**."
+        player.run_in_background(self.load_playlist(player, member, cursor, title, added))
+        return f"📃 Queued **{added}** tracks from **{title}**, loading the rest..."
+
+    async def load_playlist(self, player: GuildPlayer, member: discord.Member, cursor: PlaylistCursor, title: str, added: int):
+        """Page through the rest of a playlist into the queue"""
+        page_size = Config.MUSIC_PLAYLIST_PAGE_SIZE
+        while player.free_slots:
+            try:
+                page = await extractor.playlist_page(cursor, page_size, player.guild.id)
+            except Exception as e:
+                await player.announce(f"⚠️ Stopped loading **{title}** after {added} tracks: {e}")
+                return
+            added += self.add_entries(player, member, page["entries"])
+            if page["listed"] < page_size:
+                break
+
+        full = " The queue is full." if not player.free_slots else ""
+        await player.announce(f"📃 Finished loading **{title}**: {added} tracks queued.{full}")
+
+    def queue_embed(self, guild_id: int) -> Optional[discord.Embed]:
+        """Now playing and up next, or None if there is nothing"""
+        player = self.players.get(guild_id)
+        if player is None or not player.is_active:
+            return None
+
+        desc = ""
+        if player.current:
+            desc += f"**Now Playing:** {player.current.title}\n\n"
+        
+        if player.queue:
+            desc += "**Up Next:**\n"
+            for i, track in enumerate(player.upcoming(10), 1):
+                desc += f"{i}. {track.title}\n"
+            if len(player.queue) > 10:
+                desc += f"\n...and {len(player.queue) - 10} more"
+        
+        return Embeds.info(desc, title="Music Queue")
 
     @commands.command(name="join", help="Join the voice channel")
     async def join_prefix(self, ctx):
@@ -120,125 +375,35 @@ class Music(commands.Cog):
     @commands.command(name="play", aliases=["p"], help="Play a song")
     async def play_prefix(self, ctx, *, query: str):
         """Play a song"""
-        if not ctx.voice_client:
-            if ctx.author.voice:
-                await ctx.author.voice.channel.connect(self_deaf=True)
-            else:
-                await ctx.send("❌ You need to be in a voice channel!")
-                return
-
         async with ctx.typing():
             try:
-                # Basic search if not a URL
-                if not query.startswith("http"):
-                    query = f"ytsearch:{query}"
-
-                # Extract info but don't download yet
-                info = await self.bot.loop.run_in_executor(None, lambda: ytdl.extract_info(query, download=False))
-                
-                if 'entries' in info:
-                    info = info['entries'][0]
-                
-                url = info['webpage_url']
-                title = info['title']
-                
-                queue = self.get_queue(ctx.guild.id)
-                
-                if ctx.voice_client.is_playing() or ctx.voice_client.is_paused():
-                    queue.append((url, title))
-                    embed = Embeds.music_added_to_queue(title, len(queue))
-                    await ctx.send(embed=embed)
-                else:
-                    self.queues[ctx.guild.id] = [(url, title)] # Initialize/Reset queue with this song
-                    await self.play_next(ctx)
-                    
+                reply = await self.enqueue(ctx.guild, ctx.author, ctx.channel, query)
             except Exception as e:
-                await ctx.send(f"❌ An error occurred: {e}")
+                reply = f"❌ An error occurred: {e}"
+        if isinstance(reply, discord.Embed):
+            await ctx.send(embed=reply)
+        else:
+            await ctx.send(reply)
 
     @app_commands.command(name="play", description="Play a song from YouTube")
     @app_commands.describe(query="Song name or URL")
     async def play_slash(self, interaction: discord.Interaction, query: str):
         """Play a song"""
         await interaction.response.defer()
-        
-        if not interaction.guild.voice_client:
-            if interaction.user.voice:
-                await interaction.user.voice.channel.connect(self_deaf=True)
-            else:
-                await interaction.followup.send("❌ You need to be in a voice channel!")
-                return
-
         try:
-            # Basic search if not a URL
-            search_query = query
-            if not query.startswith("http"):
-                search_query = f"ytsearch:{query}"
-
-            # Extract info
-            info = await self.bot.loop.run_in_executor(None, lambda: ytdl.extract_info(search_query, download=False))
-            
-            if 'entries' in info:
-                info = info['entries'][0]
-            
-            url = info['webpage_url']
-            title = info['title']
-            
-            queue = self.get_queue(interaction.guild.id)
-            
-            # We need a context-like object for play_next
-            # Creating a fake context is tricky, so we'll adapt play_next or duplicate logic
-            # For simplicity in this quick implementation, we'll duplicate the logic slightly or use a helper
-            
-            if interaction.guild.voice_client.is_playing() or interaction.guild.voice_client.is_paused():
-                queue.append((url, title))
-                embed = Embeds.music_added_to_queue(title, len(queue))
-                await interaction.followup.send(embed=embed)
-            else:
-                queue.append((url, title))
-                # Trigger playback
-                # We need to call play_next but it expects ctx. 
-                # Let's manually trigger the first song here for slash command
-                
-                url_to_play, title_to_play = queue.pop(0)
-                self.current_song[interaction.guild.id] = title_to_play
-                
-                player = await YTDLSource.from_url(url_to_play, loop=self.bot.loop, stream=True)
-                
-                # We need a way to call play_next recursively. 
-                # We can create a dummy class with necessary attributes
-                class DummyContext:
-                    def __init__(self, guild, voice_client, bot, author, send):
-                        self.guild = guild
-                        self.voice_client = voice_client
-                        self.bot = bot
-                        self.author = author
-                        self.send = send
-                        self.typing = lambda: asyncio.sleep(0) # Dummy context manager
-
-                dummy_ctx = DummyContext(
-                    interaction.guild, 
-                    interaction.guild.voice_client, 
-                    self.bot, 
-                    interaction.user, 
-                    lambda embed=None, **kwargs: interaction.channel.send(embed=embed, **kwargs)
-                )
-
-                interaction.guild.voice_client.play(
-                    player, 
-                    after=lambda e: asyncio.run_coroutine_threadsafe(self.play_next(dummy_ctx), self.bot.loop)
-                )
-                
-                embed = Embeds.music_now_playing(title_to_play, url_to_play, interaction.user)
-                await interaction.followup.send(embed=embed)
-
+            reply = await self.enqueue(interaction.guild, interaction.user, interaction.channel, query)
         except Exception as e:
-            await interaction.followup.send(f"❌ An error occurred: {e}")
+            reply = f"❌ An error occurred: {e}"
+        if isinstance(reply, discord.Embed):
+            await interaction.followup.send(embed=reply)
+        else:
+            await interaction.followup.send(reply)
 
     @commands.command(name="skip", help="Skip the current song")
     async def skip_prefix(self, ctx):
         """Skip song"""
-        if ctx.voice_client and ctx.voice_client.is_playing():
-            ctx.voice_client.stop()
+        player = self.players.get(ctx.guild.id)
+        if player and player.skip():
             await ctx.send("⏭️ Skipped!")
         else:
             await ctx.send("❌ Nothing is playing.")
@@ -246,74 +411,81 @@ class Music(commands.Cog):
     @app_commands.command(name="skip", description="Skip the current song")
     async def skip_slash(self, interaction: discord.Interaction):
         """Skip song"""
-        if interaction.guild.voice_client and interaction.guild.voice_client.is_playing():
-            interaction.guild.voice_client.stop()
+        player = self.players.get(interaction.guild.id)
+        if player and player.skip():
             await interaction.response.send_message("⏭️ Skipped!")
         else:
             await interaction.response.send_message("❌ Nothing is playing.", ephemeral=True)
 
+    async def reap(self, guild: discord.Guild, reason: str):
+        """Leave a voice channel the reaper found idle or empty"""
+        player = self.players.get(guild.id)
+        if player is not None:
+            if reason == "empty":
+                await player.announce("👋 Left the voice channel since everyone else did.")
+            else:
+                await player.announce(f"👋 Left the voice channel after {self.reaper.timeout // 60} minutes of inactivity.")
+        await self.stop_player(guild)
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        """Track the bot's voice sessions and how many people are listening"""
+        if before.channel == after.channel:
+            return  # Mute/deafen changes
+        guild = member.guild
+        if member.id == self.bot.user.id:
+            if after.channel is not None:
+                self.reaper.watch(guild.id, after.channel)
+                return
+            # Disconnected, by us or by someone else: drop the player and its saved queue with it
+            self.reaper.forget(guild.id)
+            player = self.players.pop(guild.id, None)
+            if player is not None:
+                self.store.drop(guild.id)
+                await player.destroy()
+            return
+        voice_client = guild.voice_client
+        if voice_client is not None and voice_client.channel in (before.channel, after.channel):
+            self.reaper.update_listeners(guild.id, voice_client.channel)
+
+    async def stop_player(self, guild: discord.Guild):
+        """Clear the queue, stop playback and leave voice"""
+        self.store.drop(guild.id)
+        player = self.players.pop(guild.id, None)
+        if player is not None:
+            await player.destroy()
+        elif guild.voice_client:
+            guild.voice_client.stop()
+            await guild.voice_client.disconnect()
+
     @commands.command(name="stop", help="Stop music and clear queue")
     async def stop_prefix(self, ctx):
         """Stop music"""
-        self.queues[ctx.guild.id] = []
-        self.current_song[ctx.guild.id] = None
-        if ctx.voice_client:
-            ctx.voice_client.stop()
-            await ctx.voice_client.disconnect()
-        await ctx.send("cx Stopped music and cleared queue.")
+        await self.stop_player(ctx.guild)
+        await ctx.send("⏹️ Stopped music and cleared queue.")
 
     @app_commands.command(name="stop", description="Stop music and clear queue")
     async def stop_slash(self, interaction: discord.Interaction):
         """Stop music"""
-        self.queues[interaction.guild.id] = []
-        self.current_song[interaction.guild.id] = None
-        if interaction.guild.voice_client:
-            interaction.guild.voice_client.stop()
-            await interaction.guild.voice_client.disconnect()
+        await self.stop_player(interaction.guild)
         await interaction.response.send_message("⏹️ Stopped music and cleared queue.")
 
     @commands.command(name="queue", aliases=["q"], help="Show the current queue")
     async def queue_prefix(self, ctx):
         """Show queue"""
-        queue = self.get_queue(ctx.guild.id)
-        if not queue and not self.current_song.get(ctx.guild.id):
+        embed = self.queue_embed(ctx.guild.id)
+        if embed is None:
             await ctx.send("The queue is empty.")
             return
-
-        desc = ""
-        if self.current_song.get(ctx.guild.id):
-            desc += f"**Now Playing:** {self.current_song[ctx.guild.id]}\n\n"
-        
-        if queue:
-            desc += "**Up Next:**\n"
-            for i, (url, title) in enumerate(queue[:10], 1):
-                desc += f"{i}. {title}\n"
-            if len(queue) > 10:
-                desc += f"\n...and {len(queue) - 10} more"
-        
-        embed = Embeds.info(desc, title="Music Queue")
         await ctx.send(embed=embed)
 
     @app_commands.command(name="queue", description="Show the current queue")
     async def queue_slash(self, interaction: discord.Interaction):
         """Show queue"""
-        queue = self.get_queue(interaction.guild.id)
-        if not queue and not self.current_song.get(interaction.guild.id):
+        embed = self.queue_embed(interaction.guild.id)
+        if embed is None:
             await interaction.response.send_message("The queue is empty.", ephemeral=True)
             return
-
-        desc = ""
-        if self.current_song.get(interaction.guild.id):
-            desc += f"**Now Playing:** {self.current_song[interaction.guild.id]}\n\n"
-        
-        if queue:
-            desc += "**Up Next:**\n"
-            for i, (url, title) in enumerate(queue[:10], 1):
-                desc += f"{i}. {title}\n"
-            if len(queue) > 10:
-                desc += f"\n...and {len(queue) - 10} more"
-        
-        embed = Embeds.info(desc, title="Music Queue")
         await interaction.response.send_message(embed=embed)
 
     # PAUSE COMMAND
@@ -322,6 +494,7 @@ class Music(commands.Cog):
         """Pause music"""
         if ctx.voice_client and ctx.voice_client.is_playing():
             ctx.voice_client.pause()
+            self.reaper.touch(ctx.guild.id)
             await ctx.send("⏸️ Paused!")
         else:
             await ctx.send("❌ Nothing is playing.")
@@ -331,6 +504,7 @@ class Music(commands.Cog):
         """Pause music"""
         if interaction.guild.voice_client and interaction.guild.voice_client.is_playing():
             interaction.guild.voice_client.pause()
+            self.reaper.touch(interaction.guild.id)
             await interaction.response.send_message("⏸️ Paused!")
         else:
             await interaction.response.send_message("❌ Nothing is playing.", ephemeral=True)
@@ -341,6 +515,7 @@ class Music(commands.Cog):
         """Resume music"""
         if ctx.voice_client and ctx.voice_client.is_paused():
             ctx.voice_client.resume()
+            self.reaper.touch(ctx.guild.id)
             await ctx.send("▶️ Resumed!")
         else:
             await ctx.send("❌ Nothing is paused.")
@@ -350,6 +525,7 @@ class Music(commands.Cog):
         """Resume music"""
         if interaction.guild.voice_client and interaction.guild.voice_client.is_paused():
             interaction.guild.voice_client.resume()
+            self.reaper.touch(interaction.guild.id)
             await interaction.response.send_message("▶️ Resumed!")
         else:
             await interaction.response.send_message("❌ Nothing is paused.", ephemeral=True)
@@ -362,7 +538,7 @@ class Music(commands.Cog):
             return await ctx.send("❌ Not connected.")
         
         if 0 <= volume <= 100:
-            ctx.voice_client.source.volume = volume / 100
+            self.get_player(ctx.guild).set_volume(volume / 100)
             await ctx.send(f"🔊 Volume set to {volume}%")
         else:
             await ctx.send("❌ Volume must be between 0 and 100")
@@ -375,7 +551,7 @@ class Music(commands.Cog):
             return await interaction.response.send_message("❌ Not connected.", ephemeral=True)
         
         if 0 <= volume <= 100:
-            interaction.guild.voice_client.source.volume = volume / 100
+            self.get_player(interaction.guild).set_volume(volume / 100)
             await interaction.response.send_message(f"🔊 Volume set to {volume}%")
         else:
             await interaction.response.send_message("❌ Volume must be between 0 and 100", ephemeral=True)
@@ -384,10 +560,10 @@ class Music(commands.Cog):
     @commands.command(name="remove", help="Remove a song from queue")
     async def remove_prefix(self, ctx, index: int):
         """Remove song"""
-        queue = self.get_queue(ctx.guild.id)
-        if 1 <= index <= len(queue):
-            removed = queue.pop(index - 1)
-            await ctx.send(f"🗑️ Removed **{removed[1]}** from queue.")
+        player = self.players.get(ctx.guild.id)
+        removed = player.remove(index) if player else None
+        if removed:
+            await ctx.send(f"🗑️ Removed **{removed.title}** from queue.")
         else:
             await ctx.send("❌ Invalid queue index.")
 
@@ -395,12 +571,53 @@ class Music(commands.Cog):
     @app_commands.describe(index="Position in queue")
     async def remove_slash(self, interaction: discord.Interaction, index: int):
         """Remove song"""
-        queue = self.get_queue(interaction.guild.id)
-        if 1 <= index <= len(queue):
-            removed = queue.pop(index - 1)
-            await interaction.response.send_message(f"🗑️ Removed **{removed[1]}** from queue.")
+        player = self.players.get(interaction.guild.id)
+        removed = player.remove(index) if player else None
+        if removed:
+            await interaction.response.send_message(f"🗑️ Removed **{removed.title}** from queue.")
         else:
             await interaction.response.send_message("❌ Invalid queue index.", ephemeral=True)
 
+    def stats_embed(self) -> discord.Embed:
+        """Player and extractor cache numbers"""
+        stats = extractor.stats()
+        metadata, streams = stats["metadata"], stats["streams"]
+        queued = sum(len(player.queue) for player in self.players.values())
+        playing = sum(1 for player in self.players.values() if player.current is not None)
+        pool = stats["pool"]
+        restarts = sum(player.stats["restarts"] for player in self.players.values())
+        voice = self.reaper.report()
+        desc = (
+            f"**Players:** {len(self.players)} ({playing} playing, {queued} tracks queued)\n"
+            f"**Voice sessions:** {voice['sessions']} live · {voice['listeners']} listeners · {voice['empty']} empty · "
+            f"left {voice['reaped_idle']} idle and {voice['reaped_empty']} empty\n"
+            f"**Playback:** {Config.MUSIC_PLAYBACK_MODE} · {restarts} passthrough restarts\n"
+            f"**yt-dlp extractions:** {stats['extractions']} · {pool['in_flight']} running · {pool['waiting']} waiting · "
+            f"{pool['rejected']} turned away · max wait {pool['max_wait_ms']:.0f}ms\n\n"
+            f"**Metadata cache:** {metadata['hit_ratio']:.0%} hits ({metadata['hits']}/{metadata['hits'] + metadata['misses']}) · "
+            f"{metadata['entries']} entries · {metadata['bytes'] / 1024:.0f} KB\n"
+            f"**Stream URL cache:** {streams['hit_ratio']:.0%} hits ({streams['hits']}/{streams['hits'] + streams['misses']}) · "
+            f"{streams['entries']} entries · {streams['bytes'] / 1024:.0f} KB"
+        )
+        if audio_cache.enabled:
+            cache = audio_cache.report()
+            desc += (
+                f"\n**Audio cache:** {cache['hit_ratio']:.0%} hits ({cache['hits']}/{cache['hits'] + cache['misses']}) · "
+                f"{cache['bytes_served'] / 1024 ** 2:.1f} MB served · {cache['files']} files · "
+                f"{cache['bytes'] / 1024 ** 2:.0f}/{audio_cache.max_bytes / 1024 ** 2:.0f} MB · "
+                f"{cache['downloading']} downloading"
+            )
+        return Embeds.info(desc, title="Music Stats")
+
+    @commands.command(name="musicstats", help="Show music player and cache stats")
+    async def musicstats_prefix(self, ctx):
+        """Show music stats"""
+        await ctx.send(embed=self.stats_embed())
+
+    @app_commands.command(name="musicstats", description="Show music player and cache stats")
+    async def musicstats_slash(self, interaction: discord.Interaction):
+        """Show music stats"""
+        await interaction.response.send_message(embed=self.stats_embed())
+
 async def setup(bot):
     await bot.add_cog(Music(bot))
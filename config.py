@@ -14,6 +14,7 @@ class Config:
     
     # Bot Settings
     PREFIX: str = os.getenv("BOT_PREFIX", ".")
+    COMMAND_FAST_PATH: bool = True  # Skip Context construction for messages that aren't commands
     OWNER_ID: Optional[int] = None
     
     # Parse OWNER_ID safely
@@ -43,13 +44,43 @@ class Config:
     
     # Music Settings
     MUSIC_MAX_QUEUE_SIZE: int = 100
-    MUSIC_DEFAULT_VOLUME: float = 0.5
+    MUSIC_DEFAULT_VOLUME: float = 0.5  # pcm mode; opus mode starts at 100% so Opus streams are passed through
     MUSIC_TIMEOUT: int = 300  # 5 minutes of inactivity
+    MUSIC_EMPTY_TIMEOUT: int = 60  # Leave a voice channel with no listeners after this many seconds
+    MUSIC_QUEUE_SAVE_INTERVAL: int = 10  # seconds between writes of queue changes and playback positions
+    MUSIC_PLAYBACK_MODE: str = os.getenv("MUSIC_PLAYBACK_MODE", "opus")  # "opus" (pass Opus streams through at 100%) or "pcm"
+    MUSIC_STREAM_REFRESH_MARGIN: int = 120  # Re-resolve stream URLs expiring within track length + this many seconds
+    MUSIC_METADATA_CACHE_SIZE: int = 5000  # Extracted videos/searches kept in memory
+    MUSIC_METADATA_CACHE_BYTES: int = 4 * 1024 * 1024
+    MUSIC_STREAM_CACHE_SIZE: int = 2000  # Direct stream URLs kept until they expire
+    MUSIC_STREAM_CACHE_BYTES: int = 8 * 1024 * 1024
+    MUSIC_STREAM_CACHE_TTL: int = 1800  # seconds, for stream URLs without an expire parameter
+    MUSIC_EXTRACTOR_MODE: str = os.getenv("MUSIC_EXTRACTOR_MODE", "thread")  # "thread" or "process"
+    MUSIC_EXTRACTOR_WORKERS: int = 4
+    MUSIC_EXTRACTOR_QUEUE_SIZE: int = 100  # Waiting extractions before new requests are turned away
+    MUSIC_EXTRACTOR_PER_GUILD: int = 2  # Concurrent extractions per guild
+    MUSIC_PLAYLIST_FIRST_PAGE: int = 5  # Playlist entries listed before playback starts
+    MUSIC_PLAYLIST_PAGE_SIZE: int = 100  # Entries per background listing request after that
+    MUSIC_AUDIO_CACHE: bool = os.getenv("MUSIC_AUDIO_CACHE", "false").lower() == "true"  # Opt-in local copies
+    MUSIC_AUDIO_CACHE_DIR: str = "data/audio_cache"
+    MUSIC_AUDIO_CACHE_MAX_BYTES: int = int(os.getenv("MUSIC_AUDIO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+    MUSIC_AUDIO_CACHE_MIN_PLAYS: int = 3  # Plays before a track is downloaded
+    MUSIC_AUDIO_CACHE_MAX_DURATION: int = 900  # seconds, longer tracks are never cached
+    MUSIC_AUDIO_CACHE_TRACKED_PLAYS: int = 10000  # Uncached tracks whose play count is kept
     
     # Moderation Settings
     SPAM_THRESHOLD: int = 5
     SPAM_TIME_WINDOW: int = 5  # seconds
     SPAM_MUTE_DURATION: int = 60  # seconds
+    SPAM_MAX_TRACKED: int = 50000  # (guild, user) windows kept in memory
+    SPAM_IDLE_TTL: int = 300  # seconds before an idle window is evicted
+    SPAM_ENFORCEMENT_QUEUE_SIZE: int = 1000  # Pending punishments before new ones are dropped
+    BAD_WORDS_URLS: tuple = (
+        "https://raw.githubusercontent.com/RobertJGabriel/Google-profanity-words/master/list.txt",
+        "https://raw.githubusercontent.com/phantom-exe/stock/main/custom_bad_words.txt",
+    )
+    BAD_WORDS_CACHE_DIR: str = "data/bad_words"
+    BAD_WORDS_REFRESH_INTERVAL: int = 21600  # 6 hours
     
     # Economy Settings
     ECONOMY_DAILY_REWARD: int = 100
@@ -62,9 +93,28 @@ class Config:
     XP_PER_MESSAGE: int = 10
     XP_COOLDOWN: int = 60  # 1 minute between XP gains
     XP_MULTIPLIER: float = 1.0
+    XP_COOLDOWN_CACHE_SIZE: int = 100000  # Max (guild, user) cooldowns kept in memory
+    LEVEL_UP_MESSAGES: bool = True
     
     # Database
     DATABASE_PATH: str = "data/bot.db"
+    DATABASE_READ_POOL_SIZE: int = 3  # Read-only connections (0 = share the writer)
+    DATABASE_SYNCHRONOUS: str = "NORMAL"  # Safe with WAL, avoids an fsync per commit
+    DATABASE_CACHE_SIZE_KB: int = 16384  # Page cache per connection
+    DATABASE_MMAP_SIZE: int = 128 * 1024 * 1024  # bytes
+    WRITE_BUFFER_MAX_ROWS: int = 500  # Flush once this many profiles are dirty
+    WRITE_BUFFER_FLUSH_INTERVAL: float = 5.0  # seconds
+    
+    # Sharding
+    SHARD_COUNT: Optional[int] = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None  # None = Discord's recommendation
+    CLUSTER_COUNT: int = int(os.getenv("CLUSTER_COUNT", "1"))  # Processes started by launcher.py
+    IPC_HOST: str = "127.0.0.1"
+    IPC_BASE_PORT: int = int(os.getenv("IPC_BASE_PORT", "8700"))  # Cluster N listens on IPC_BASE_PORT + N
+    IPC_TIMEOUT: float = 3.0  # seconds
+    SHARD_STATS_INTERVAL: int = 300  # seconds between per-shard stats log lines
+    
+    # Startup
+    COLD_START_TARGET_MS: int = int(os.getenv("COLD_START_TARGET_MS", "3000"))  # Import + cog loading budget
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -0,0 +1,114 @@
+"""
+MeowDow Cluster Launcher
+Runs the bot's shards across several worker processes
+
+Usage: python launcher.py [--clusters 2] [--shards 8]
+"""
+import aiohttp
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import secrets
+import sys
+import time
+
+from config import Config
+from utils.sharding import shard_ranges
+
+logging.basicConfig(
+    level=getattr(logging, Config.LOG_LEVEL),
+    format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger("launcher")
+
+# Restart a crashed cluster after this many seconds, doubling up to the max
+RESTART_DELAY = 5
+RESTART_DELAY_MAX = 300
+
+async def fetch_recommended_shards(token: str) -> int:
+    """Ask Discord how many shards the bot should run"""
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession() as session:
+        async with session.get("https://discord.com/api/v10/gateway/bot", headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return data["shards"]
+
+async def migrate_database() -> int:
+    """Bring the schema up to date once, before the clusters open the database together"""
+    from utils.database import db
+    return await db.migrate()
+
+def run_cluster(cluster_id: int, shard_ids: list, shard_count: int, cluster_count: int, ipc_secret: str):
+    """Worker process entry point"""
+    import bot  # Imported in the child so each cluster sets up its own logging and event loop
+    try:
+        asyncio.run(bot.main(
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            cluster_id=cluster_id,
+            cluster_count=cluster_count,
+            ipc_secret=ipc_secret,
+        ))
+    except KeyboardInterrupt:
+        pass
+
+def start_cluster(context, cluster_id: int, shard_ids: list, shard_count: int, cluster_count: int, ipc_secret: str):
+    process = context.Process(
+        target=run_cluster,
+        args=(cluster_id, shard_ids, shard_count, cluster_count, ipc_secret),
+        name=f"cluster-{cluster_id}",
+    )
+    process.start()
+    logger.info(f"Started cluster {cluster_id} (pid {process.pid}) with shards {shard_ids[0]}-{shard_ids[-1]}")
+    return process
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clusters", type=int, default=Config.CLUSTER_COUNT, help="worker processes")
+    parser.add_argument("--shards", type=int, default=Config.SHARD_COUNT, help="total shards (default: Discord's recommendation)")
+    args = parser.parse_args()
+
+    shard_count = args.shards or asyncio.run(fetch_recommended_shards(Config.DISCORD_TOKEN))
+    ranges = shard_ranges(shard_count, args.clusters)
+    ipc_secret = secrets.token_hex(16)
+    logger.info(f"Database at schema version {asyncio.run(migrate_database())}")
+    logger.info(f"Launching {shard_count} shards across {len(ranges)} clusters")
+
+    # spawn: each cluster gets a clean interpreter instead of a fork of this one
+    context = multiprocessing.get_context("spawn")
+    processes = {
+        cluster_id: start_cluster(context, cluster_id, shard_ids, shard_count, len(ranges), ipc_secret)
+        for cluster_id, shard_ids in enumerate(ranges)
+    }
+    delays = {cluster_id: RESTART_DELAY for cluster_id in processes}
+    restart_at = {}  # cluster_id -> time.monotonic() deadline
+
+    try:
+        while True:
+            time.sleep(1)
+            now = time.monotonic()
+            for cluster_id, process in processes.items():
+                if process.is_alive() or cluster_id in restart_at:
+                    continue
+                delay = delays[cluster_id]
+                logger.warning(f"Cluster {cluster_id} exited with code {process.exitcode}, restarting in {delay}s")
+                restart_at[cluster_id] = now + delay
+                delays[cluster_id] = min(delay * 2, RESTART_DELAY_MAX)
+            for cluster_id, deadline in list(restart_at.items()):
+                if now >= deadline:
+                    del restart_at[cluster_id]
+                    processes[cluster_id] = start_cluster(
+                        context, cluster_id, ranges[cluster_id], shard_count, len(ranges), ipc_secret
+                    )
+    except KeyboardInterrupt:
+        logger.info("Stopping clusters...")
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(timeout=30)
+
+if __name__ == "__main__":
+    main()
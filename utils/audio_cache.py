@@ -0,0 +1,178 @@
+"""
+Audio cache
+Opt-in on-disk copies of frequently played YouTube tracks, evicted LRU within a byte budget
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+from config import Config
+from utils.ytdl import YTDL_OPTIONS, cache_key
+
+logger = logging.getLogger(__name__)
+
+def download_audio(url: str, directory: str, video_id: str, stop: threading.Event) -> Tuple[str, int]:
+    """Download a track's audio into directory/tmp, then move it into place; returns (path, size)"""
+    import yt_dlp
+
+    def check_stop(progress: dict):
+        if stop.is_set():
+            raise yt_dlp.utils.DownloadCancelled("Shutting down")
+
+    tmp_dir = os.path.join(directory, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    options = {
+        **YTDL_OPTIONS,
+        'outtmpl': os.path.join(tmp_dir, f"{video_id}.%(ext)s"),
+        'progress_hooks': [check_stop],  # Lets shutdown end a download instead of waiting for it
+    }
+    with yt_dlp.YoutubeDL(options) as ydl:
+        info = ydl.extract_info(url, download=True)
+        downloaded = ydl.prepare_filename(info)
+    path = os.path.join(directory, os.path.basename(downloaded))
+    os.replace(downloaded, path)  # Atomic, so a half-written file is never served
+    return path, os.path.getsize(path)
+
+def video_id(url: str) -> Optional[str]:
+    """YouTube video id of a track URL, the cache key"""
+    key = cache_key(url)
+    return key[len("youtube:"):] if key.startswith("youtube:") else None
+
+def touch(path: str) -> bool:
+    """Bump a file's mtime, False if it is gone"""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+class AudioCache:
+    """LRU file cache keyed by video id"""
+
+    def __init__(self, directory: str = Config.MUSIC_AUDIO_CACHE_DIR, max_bytes: int = Config.MUSIC_AUDIO_CACHE_MAX_BYTES,
+                 min_plays: int = Config.MUSIC_AUDIO_CACHE_MIN_PLAYS, enabled: bool = Config.MUSIC_AUDIO_CACHE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self.enabled = enabled
+        self.files: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()  # video_id -> (path, size), LRU first
+        self.bytes = 0
+        self.plays: "OrderedDict[str, int]" = OrderedDict()  # video_id -> plays while uncached
+        self._downloading: Dict[str, asyncio.Future] = {}
+        # One download at a time, apart from the extractor pool so it never delays play
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="audio-cache")
+        self._stop = threading.Event()
+        self._loaded = False
+        self.stats = {"hits": 0, "misses": 0, "bytes_served": 0, "downloads": 0, "failed": 0, "evicted": 0}
+
+    def load(self) -> int:
+        """Index the files already on disk, oldest access first"""
+        if self._loaded or not self.enabled:
+            return len(self.files)
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, os.path.splitext(entry.name)[0], entry.path, stat.st_size))
+        for _, vid, path, size in sorted(entries):
+            self.files[vid] = (path, size)
+            self.bytes += size
+        self._loaded = True
+        self._evict()
+        return len(self.files)
+
+    async def lookup(self, url: str, count: bool = True) -> Optional[str]:
+        """Local file for a track, counting the hit or miss unless count is False (e.g. a reopen)"""
+        if not self.enabled:
+            return None
+        vid = video_id(url)
+        entry = self.files.get(vid) if vid else None
+        # mtime carries LRU order across restarts; touched off the event loop
+        if entry is not None and not await asyncio.to_thread(touch, entry[0]):
+            if self.files.get(vid) is entry:
+                self._drop(vid)  # Deleted behind our back
+            entry = None
+        if entry is None:
+            if count:
+                self.stats["misses"] += 1
+            return None
+        path, size = entry
+        if vid in self.files:
+            self.files.move_to_end(vid)
+        if count:
+            self.stats["hits"] += 1
+            self.stats["bytes_served"] += size
+        return path
+
+    def contains(self, url: str) -> bool:
+        vid = video_id(url)
+        return vid is not None and vid in self.files
+
+    def record_play(self, url: str, duration: Optional[int] = None):
+        """Count a play of an uncached track, downloading it in the background once popular"""
+        if not self.enabled:
+            return
+        vid = video_id(url)
+        if vid is None or vid in self.files or vid in self._downloading:
+            return
+        if duration and duration > Config.MUSIC_AUDIO_CACHE_MAX_DURATION:
+            return  # Long mixes would eat the budget
+        plays = self.plays.pop(vid, 0) + 1
+        if plays < self.min_plays:
+            self.plays[vid] = plays
+            while len(self.plays) > Config.MUSIC_AUDIO_CACHE_TRACKED_PLAYS:
+                self.plays.popitem(last=False)
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, download_audio, url, self.directory, vid, self._stop)
+        self._downloading[vid] = future
+        future.add_done_callback(lambda done: self._downloaded(vid, done))
+
+    def _downloaded(self, vid: str, done: asyncio.Future):
+        self._downloading.pop(vid, None)
+        if done.cancelled():
+            return
+        if done.exception() is not None:
+            self.stats["failed"] += 1
+            logger.warning(f"Failed to cache audio for {vid}: {done.exception()}")
+            return
+        path, size = done.result()
+        self.files[vid] = (path, size)
+        self.bytes += size
+        self.stats["downloads"] += 1
+        self._evict()
+
+    def _drop(self, vid: str):
+        path, size = self.files.pop(vid)
+        self.bytes -= size
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        while self.files and self.bytes > self.max_bytes:
+            self._drop(next(iter(self.files)))
+            self.stats["evicted"] += 1
+
+    def report(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+            "files": len(self.files),
+            "bytes": self.bytes,
+            "downloading": len(self._downloading),
+        }
+
+    def shutdown(self):
+        """Cancel queued downloads and end the running one, so it doesn't hold up exit"""
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+audio_cache = AudioCache()
@@ -0,0 +1,52 @@
+"""
+Command name trie
+Resolves the word after a prefix to a command without slicing the message or building a Context
+"""
+from typing import Optional, Iterable, Tuple
+
+class CommandTrie:
+    """Character trie over command names and aliases"""
+
+    # Key under which a node stores the qualified name of the command ending there
+    _END = ""
+
+    def __init__(self, names: Iterable[Tuple[str, str]] = ()):
+        self._root: dict = {}
+        self.size = 0
+        for name, command in names:
+            self.add(name, command)
+
+    @classmethod
+    def from_bot(cls, bot) -> "CommandTrie":
+        """Build from the bot's top-level prefix commands and their aliases"""
+        trie = cls()
+        for command in bot.commands:
+            trie.add(command.name, command.qualified_name)
+            for alias in command.aliases:
+                trie.add(alias, command.qualified_name)
+        return trie
+
+    def add(self, name: str, command: str):
+        node = self._root
+        for char in name:
+            node = node.setdefault(char, {})
+        if self._END not in node:
+            self.size += 1
+        node[self._END] = command
+
+    def match(self, text: str, start: int = 0) -> Optional[str]:
+        """Resolve the word starting at text[start] to a command name, or None"""
+        node = self._root
+        length = len(text)
+        i = start
+        while i < length:
+            char = text[i]
+            if char.isspace():
+                break
+            node = node.get(char)
+            if node is None:
+                return None
+            i += 1
+        if i == start:
+            return None
+        return node.get(self._END)
@@ -2,29 +2,262 @@
 Database handler using aiosqlite for async operations
 """
 import aiosqlite
+import asyncio
+import logging
 import os
-from typing import Optional, List, Tuple, Any
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, List, Tuple, Dict, Any
 from config import Config
+from utils.leaderboard import LeaderboardIndex, LEADERBOARD_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Numbered schema migrations, applied in order and tracked with PRAGMA user_version.
+# Append new entries; never edit or reorder ones that have shipped.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Index mod cases by guild and user", [
+        "CREATE INDEX IF NOT EXISTS idx_mod_cases_guild_user ON mod_cases (guild_id, user_id)",
+    ]),
+    (2, "Index warning history by guild, user and date", [
+        "CREATE INDEX IF NOT EXISTS idx_warnings_guild_user_created ON warnings (guild_id, user_id, created_at DESC)",
+    ]),
+    (3, "Covering indexes for leaderboards", [
+        "CREATE INDEX IF NOT EXISTS idx_profiles_guild_xp ON user_profiles (guild_id, xp DESC, user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_profiles_guild_balance ON user_profiles (guild_id, balance DESC, user_id)",
+    ]),
+    (4, "Per-guild spam thresholds", [
+        "ALTER TABLE server_settings ADD COLUMN spam_threshold INTEGER",
+        "ALTER TABLE server_settings ADD COLUMN spam_time_window INTEGER",
+    ]),
+    (5, "Persisted spam unmute schedule", [
+        """CREATE TABLE IF NOT EXISTS spam_mutes (
+            guild_id INTEGER,
+            user_id INTEGER,
+            channel_id INTEGER,
+            unmute_at REAL,
+            PRIMARY KEY (guild_id, user_id)
+        )""",
+    ]),
+    (6, "Per-guild disabled message pipeline stages", [
+        "ALTER TABLE server_settings ADD COLUMN disabled_stages TEXT",
+    ]),
+    (7, "Last synced app command tree hash per scope", [
+        """CREATE TABLE IF NOT EXISTS command_sync (
+            scope TEXT PRIMARY KEY,
+            hash TEXT,
+            synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ]),
+    (8, "Persisted music queues", [
+        """CREATE TABLE IF NOT EXISTS music_sessions (
+            guild_id INTEGER PRIMARY KEY,
+            voice_channel_id INTEGER,
+            text_channel_id INTEGER,
+            volume REAL,
+            current_seq INTEGER,
+            position REAL
+        )""",
+        """CREATE TABLE IF NOT EXISTS music_queue (
+            guild_id INTEGER,
+            seq INTEGER,
+            url TEXT,
+            title TEXT,
+            duration INTEGER,
+            requester_id INTEGER,
+            PRIMARY KEY (guild_id, seq)
+        )""",
+    ]),
+]
 
 class Database:
     """Async database handler"""
     
     def __init__(self, db_path: str = Config.DATABASE_PATH):
         self.db_path = db_path
-        self.conn: Optional[aiosqlite.Connection] = None
+        self.conn: Optional[aiosqlite.Connection] = None  # Single writer connection
+        self._readers: List[aiosqlite.Connection] = []
+        self._reader_pool: Optional[asyncio.Queue] = None
+        
+        # In-memory leaderboards, includes deltas still in the write buffer
+        self.leaderboards = LeaderboardIndex()
+        
+        # guild_id -> {field: value} for SERVER_SETTING_FIELDS
+        self.server_settings: Dict[int, Dict[str, Any]] = {}
+        
+        # Write-behind buffer: (user_id, guild_id) -> [xp, balance, messages, level]
+        self._pending: Dict[Tuple[int, int], List[int]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+        self.write_stats: Dict[str, Any] = {
+            "buffered_updates": 0,   # update_* calls absorbed by the buffer
+            "flushes": 0,
+            "rows_flushed": 0,
+            "last_flush_rows": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
         
     async def connect(self):
         """Connect to the database"""
+        await self._open_writer()
+        await self.load_leaderboards()
+        
+        # Read-only connections so reads don't queue behind the writer's thread
+        self._reader_pool = asyncio.Queue()
+        for _ in range(Config.DATABASE_READ_POOL_SIZE):
+            reader = await aiosqlite.connect(f"file:{os.path.abspath(self.db_path)}?mode=ro", uri=True)
+            reader.row_factory = aiosqlite.Row
+            await self._apply_pragmas(reader)
+            await reader.execute("PRAGMA query_only = ON")
+            self._readers.append(reader)
+            self._reader_pool.put_nowait(reader)
+        
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        
+    async def migrate(self) -> int:
+        """Create the tables and apply pending migrations, then disconnect; returns the schema version"""
+        await self._open_writer()
+        try:
+            return await self.get_schema_version()
+        finally:
+            await self.conn.close()
+            self.conn = None
+    
+    async def _open_writer(self):
+        """Open the writer connection with the schema up to date"""
         # Ensure data directory exists
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         self.conn = await aiosqlite.connect(self.db_path)
         self.conn.row_factory = aiosqlite.Row
+        await self.conn.execute("PRAGMA journal_mode = WAL")
+        await self._apply_pragmas(self.conn)
         await self.create_tables()
-        
+        await self.run_migrations()
+    
     async def close(self):
         """Close the database connection"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
+        self._reader_pool = None
         if self.conn:
+            await self.flush()
             await self.conn.close()
+            self.conn = None
+    
+    async def _apply_pragmas(self, conn: aiosqlite.Connection):
+        """Apply performance pragmas to a connection"""
+        await conn.execute(f"PRAGMA synchronous = {Config.DATABASE_SYNCHRONOUS}")
+        await conn.execute(f"PRAGMA cache_size = {-Config.DATABASE_CACHE_SIZE_KB}")
+        await conn.execute(f"PRAGMA mmap_size = {Config.DATABASE_MMAP_SIZE}")
+        await conn.execute("PRAGMA temp_store = MEMORY")
+        await conn.execute("PRAGMA busy_timeout = 5000")
+    
+    @asynccontextmanager
+    async def _read_conn(self):
+        """Borrow a connection from the read pool (falls back to the writer)"""
+        if not self._readers:
+            yield self.conn
+            return
+        
+        reader = await self._reader_pool.get()
+        try:
+            yield reader
+        finally:
+            self._reader_pool.put_nowait(reader)
+    
+    # Write-behind Buffer
+    def _buffer(self, user_id: int, guild_id: int, xp: int = 0, balance: int = 0, messages: int = 0, level: int = 0):
+        """Coalesce a profile delta into the pending buffer"""
+        key = (user_id, guild_id)
+        row = self._pending.get(key)
+        if row is None:
+            row = self._pending[key] = [0, 0, 0, 0]
+        row[0] += xp
+        row[1] += balance
+        row[2] += messages
+        if level > row[3]:
+            row[3] = level
+    
+    async def _maybe_flush(self):
+        """Flush when the buffer reaches its size trigger"""
+        if len(self._pending) >= Config.WRITE_BUFFER_MAX_ROWS:
+            await self.flush()
+    
+    def _schedule_flush(self):
+        """Start a size-triggered flush in the background instead of awaiting it"""
+        if len(self._pending) >= Config.WRITE_BUFFER_MAX_ROWS and not self._size_flush:
+            self._size_flush = asyncio.create_task(self.flush())
+            self._size_flush.add_done_callback(self._on_size_flush_done)
+    
+    def _on_size_flush_done(self, task: asyncio.Task):
+        self._size_flush = None
+        if not task.cancelled() and task.exception():
+            logger.error(f"Write-behind flush failed: {task.exception()}")
+    
+    async def _flush_loop(self):
+        """Flush the buffer on a timer"""
+        while True:
+            await asyncio.sleep(Config.WRITE_BUFFER_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {e}")
+    
+    async def flush(self) -> int:
+        """Write all buffered profile deltas in a single transaction"""
+        async with self._flush_lock:
+            if not self._pending or not self.conn:
+                return 0
+            
+            batch, self._pending = self._pending, {}
+            start = time.perf_counter()
+            try:
+                await self.conn.executemany("""
+                    INSERT INTO user_profiles (user_id, guild_id, xp, balance, messages, level, last_xp)
+                    VALUES (?, ?, ?, ?, ?, ?, CASE WHEN ? > 0 THEN CURRENT_TIMESTAMP END)
+                    ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                        xp = xp + excluded.xp,
+                        balance = balance + excluded.balance,
+                        messages = messages + excluded.messages,
+                        level = MAX(level, excluded.level),
+                        last_xp = COALESCE(excluded.last_xp, last_xp)
+                """, [
+                    (user_id, guild_id, xp, balance, messages, level, messages)
+                    for (user_id, guild_id), (xp, balance, messages, level) in batch.items()
+                ])
+                await self.conn.commit()
+            except BaseException:
+                # Put the batch back so nothing is lost; newer deltas are merged on top
+                for (user_id, guild_id), (xp, balance, messages, level) in batch.items():
+                    self._buffer(user_id, guild_id, xp, balance, messages, level)
+                await self.conn.rollback()
+                raise
+            
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats = self.write_stats
+            stats["flushes"] += 1
+            stats["rows_flushed"] += len(batch)
+            stats["last_flush_rows"] = len(batch)
+            stats["last_flush_ms"] = elapsed_ms
+            stats["max_flush_ms"] = max(stats["max_flush_ms"], elapsed_ms)
+            stats["total_flush_ms"] += elapsed_ms
+            return len(batch)
+    
+    def get_write_stats(self) -> Dict[str, Any]:
+        """Get write-behind buffer counters"""
+        stats = dict(self.write_stats)
+        stats["buffered_rows"] = len(self._pending)
+        flushes = stats["flushes"]
+        stats["avg_rows_per_flush"] = stats["rows_flushed"] / flushes if flushes else 0.0
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / flushes if flushes else 0.0
+        return stats
             
     async def create_tables(self):
         """Create all necessary tables"""
@@ -110,31 +343,113 @@ class Database:
             
             await self.conn.commit()
     
+    async def get_schema_version(self) -> int:
+        """Get the schema version stored in PRAGMA user_version"""
+        async with self.conn.execute("PRAGMA user_version") as cursor:
+            row = await cursor.fetchone()
+            return row[0]
+    
+    async def run_migrations(self) -> int:
+        """Apply pending schema migrations, returns the resulting version"""
+        version = await self.get_schema_version()
+        for number, description, statements in MIGRATIONS:
+            if number <= version:
+                continue
+            
+            start = time.perf_counter()
+            try:
+                # IMMEDIATE takes the write lock before the version is checked, so clusters
+                # starting together on one database apply each migration exactly once
+                await self.conn.execute("BEGIN IMMEDIATE")
+                version = await self.get_schema_version()
+                if number <= version:
+                    await self.conn.rollback()
+                    continue  # Another process got here first
+                for statement in statements:
+                    await self.conn.execute(statement)
+                await self.conn.execute(f"PRAGMA user_version = {number}")
+                await self.conn.commit()
+            except Exception:
+                await self.conn.rollback()
+                logger.error(f"Migration {number} ({description}) failed")
+                raise
+            
+            version = number
+            logger.info(f"Applied migration {number}: {description} ({(time.perf_counter() - start) * 1000:.1f}ms)")
+        return version
+    
     # Server Settings Methods
+    SERVER_SETTING_FIELDS = (
+        "prefix", "welcome_channel_id", "log_channel_id", "muted_role_id",
+        "spam_threshold", "spam_time_window", "disabled_stages",
+    )
+    
+    async def load_server_settings(self) -> int:
+        """Bulk-load all server settings into the in-memory cache"""
+        async with self._read_conn() as conn, conn.cursor() as cursor:
+            await cursor.execute(
+                f"SELECT guild_id, {', '.join(self.SERVER_SETTING_FIELDS)} FROM server_settings"
+            )
+            rows = await cursor.fetchall()
+        self.server_settings = {
+            row['guild_id']: {field: row[field] for field in self.SERVER_SETTING_FIELDS}
+            for row in rows
+        }
+        return len(self.server_settings)
+    
+    def get_server_setting(self, guild_id: int, field: str) -> Any:
+        """Get a cached server setting without touching the database"""
+        settings = self.server_settings.get(guild_id)
+        if settings is None or settings[field] is None:
+            return Config.PREFIX if field == "prefix" else None
+        return settings[field]
+    
+    def get_cached_prefix(self, guild_id: int) -> str:
+        """Get custom prefix for a server from the cache"""
+        return self.get_server_setting(guild_id, "prefix")
+    
     async def get_server_prefix(self, guild_id: int) -> str:
         """Get custom prefix for a server"""
+        return self.get_cached_prefix(guild_id)
+    
+    async def set_server_setting(self, guild_id: int, field: str, value: Any):
+        """Set a server setting (write-through to the cache)"""
+        if field not in self.SERVER_SETTING_FIELDS:
+            raise ValueError(f"Unknown server setting: {field}")
+        
+        # New rows get the configured default prefix rather than the column default
+        prefix = value if field == "prefix" else self.get_cached_prefix(guild_id)
         async with self.conn.cursor() as cursor:
-            await cursor.execute(
-                "SELECT prefix FROM server_settings WHERE guild_id = ?",
-                (guild_id,)
-            )
-            result = await cursor.fetchone()
-            return result['prefix'] if result else Config.PREFIX
+            if field == "prefix":
+                await cursor.execute("""
+                    INSERT INTO server_settings (guild_id, prefix)
+                    VALUES (?, ?)
+                    ON CONFLICT(guild_id) DO UPDATE SET prefix = excluded.prefix
+                """, (guild_id, prefix))
+            else:
+                await cursor.execute(f"""
+                    INSERT INTO server_settings (guild_id, prefix, {field})
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(guild_id) DO UPDATE SET {field} = excluded.{field}
+                """, (guild_id, prefix, value))
+            await self.conn.commit()
+        
+        settings = self.server_settings.setdefault(
+            guild_id, {f: None for f in self.SERVER_SETTING_FIELDS}
+        )
+        settings["prefix"] = settings["prefix"] or prefix
+        settings[field] = value
     
     async def set_server_prefix(self, guild_id: int, prefix: str):
         """Set custom prefix for a server"""
-        async with self.conn.cursor() as cursor:
-            await cursor.execute("""
-                INSERT INTO server_settings (guild_id, prefix)
-                VALUES (?, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET prefix = ?
-            """, (guild_id, prefix, prefix))
-            await self.conn.commit()
+        await self.set_server_setting(guild_id, "prefix", prefix)
     
     # User Profile Methods
     async def get_user_profile(self, user_id: int, guild_id: int) -> Optional[aiosqlite.Row]:
         """Get user profile"""
-        async with self.conn.cursor() as cursor:
+        if (user_id, guild_id) in self._pending:
+            await self.flush()
+        async with self._read_conn() as conn, conn.cursor() as cursor:
             await cursor.execute(
                 "SELECT * FROM user_profiles WHERE user_id = ? AND guild_id = ?",
                 (user_id, guild_id)
@@ -151,30 +466,49 @@ class Database:
             await self.conn.commit()
     
     async def update_balance(self, user_id: int, guild_id: int, amount: int):
-        """Update user balance"""
-        await self.create_user_profile(user_id, guild_id)
-        async with self.conn.cursor() as cursor:
-            await cursor.execute("""
-                UPDATE user_profiles
-                SET balance = balance + ?
-                WHERE user_id = ? AND guild_id = ?
-            """, (amount, user_id, guild_id))
-            await self.conn.commit()
+        """Update user balance (buffered, see flush)"""
+        self._buffer(user_id, guild_id, balance=amount)
+        self.write_stats["buffered_updates"] += 1
+        self.leaderboards.add(guild_id, user_id, "balance", amount)
+        # Zero deltas register a new profile on the other boards, like the SQL row would
+        self.leaderboards.add(guild_id, user_id, "xp", 0)
+        self.leaderboards.add(guild_id, user_id, "messages", 0)
+        await self._maybe_flush()
     
     async def update_xp(self, user_id: int, guild_id: int, xp: int):
-        """Update user XP"""
-        await self.create_user_profile(user_id, guild_id)
-        async with self.conn.cursor() as cursor:
-            await cursor.execute("""
-                UPDATE user_profiles
-                SET xp = xp + ?, messages = messages + 1, last_xp = CURRENT_TIMESTAMP
-                WHERE user_id = ? AND guild_id = ?
-            """, (xp, user_id, guild_id))
-            await self.conn.commit()
+        """Update user XP (buffered, see flush)"""
+        self.queue_xp(user_id, guild_id, xp)
+        await self._maybe_flush()
     
-    async def get_leaderboard(self, guild_id: int, field: str = "xp", limit: int = 10) -> List[aiosqlite.Row]:
-        """Get leaderboard for a specific field"""
-        async with self.conn.cursor() as cursor:
+    def queue_xp(self, user_id: int, guild_id: int, xp: int, level: int = 0):
+        """Buffer an XP gain without awaiting the database (for the message hot path)"""
+        self._buffer(user_id, guild_id, xp=xp, messages=1, level=level)
+        self.write_stats["buffered_updates"] += 1
+        self.leaderboards.add(guild_id, user_id, "xp", xp)
+        self.leaderboards.add(guild_id, user_id, "messages", 1)
+        if self.leaderboards.score(guild_id, "balance", user_id) is None:
+            self.leaderboards.add(guild_id, user_id, "balance", 0)  # New profile, ranked at 0
+        self._schedule_flush()
+    
+    async def load_leaderboards(self) -> int:
+        """Rebuild the in-memory leaderboard index from user_profiles"""
+        start = time.perf_counter()
+        async with self.conn.execute(
+            f"SELECT guild_id, user_id, {', '.join(LEADERBOARD_FIELDS)} FROM user_profiles"
+        ) as cursor:
+            rows = await cursor.fetchall()
+        count = self.leaderboards.rebuild(rows)
+        logger.info(f"Built leaderboards for {count} profiles in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return count
+    
+    async def get_leaderboard(self, guild_id: int, field: str = "xp", limit: int = 10) -> List[Tuple[int, int]]:
+        """Get (user_id, value) pairs for the top of a leaderboard"""
+        if field in LEADERBOARD_FIELDS:
+            return self.leaderboards.top(guild_id, field, limit)
+        
+        if self._pending:
+            await self.flush()
+        async with self._read_conn() as conn, conn.cursor() as cursor:
             await cursor.execute(f"""
                 SELECT user_id, {field}
                 FROM user_profiles
@@ -182,7 +516,15 @@ class Database:
                 ORDER BY {field} DESC
                 LIMIT ?
             """, (guild_id, limit))
-            return await cursor.fetchall()
+            return [tuple(row) for row in await cursor.fetchall()]
+    
+    def get_rank(self, guild_id: int, user_id: int, field: str = "xp") -> Optional[int]:
+        """Get a user's 1-based leaderboard rank"""
+        return self.leaderboards.rank(guild_id, field, user_id)
+    
+    def get_rank_neighbours(self, guild_id: int, rank: int, field: str = "xp", radius: int = 2) -> List[Tuple[int, int, int]]:
+        """Get (rank, user_id, value) entries around a rank"""
+        return self.leaderboards.around(guild_id, field, rank, radius)
     
     # Moderation Methods
     async def add_mod_case(self, guild_id: int, user_id: int, moderator_id: int, action: str, reason: str) -> int:
@@ -207,13 +549,89 @@ class Database:
     
     async def get_warnings(self, guild_id: int, user_id: int) -> List[aiosqlite.Row]:
         """Get all warnings for a user"""
-        async with self.conn.cursor() as cursor:
+        async with self._read_conn() as conn, conn.cursor() as cursor:
             await cursor.execute("""
                 SELECT * FROM warnings
                 WHERE guild_id = ? AND user_id = ?
                 ORDER BY created_at DESC
             """, (guild_id, user_id))
             return await cursor.fetchall()
+    
+    async def add_spam_mute(self, guild_id: int, user_id: int, channel_id: int, unmute_at: float):
+        """Schedule the end of a spam mute"""
+        async with self.conn.cursor() as cursor:
+            await cursor.execute("""
+                INSERT OR REPLACE INTO spam_mutes (guild_id, user_id, channel_id, unmute_at)
+                VALUES (?, ?, ?, ?)
+            """, (guild_id, user_id, channel_id, unmute_at))
+            await self.conn.commit()
+    
+    async def remove_spam_mute(self, guild_id: int, user_id: int):
+        """Remove a finished spam mute"""
+        async with self.conn.cursor() as cursor:
+            await cursor.execute(
+                "DELETE FROM spam_mutes WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id)
+            )
+            await self.conn.commit()
+    
+    async def get_spam_mutes(self) -> List[aiosqlite.Row]:
+        """Get every scheduled spam unmute"""
+        async with self._read_conn() as conn, conn.cursor() as cursor:
+            await cursor.execute("SELECT * FROM spam_mutes ORDER BY unmute_at")
+            return await cursor.fetchall()
+
+    # Music Queue Methods
+    async def save_music_changes(self, dropped: List[int], deleted: List[Tuple[int, int]],
+                                 inserted: List[tuple], sessions: List[tuple]):
+        """Apply buffered music queue changes in a single transaction"""
+        async with self._flush_lock:  # Don't interleave with the profile flush on the writer connection
+            try:
+                if dropped:
+                    await self.conn.executemany("DELETE FROM music_queue WHERE guild_id = ?", [(g,) for g in dropped])
+                    await self.conn.executemany("DELETE FROM music_sessions WHERE guild_id = ?", [(g,) for g in dropped])
+                await self.conn.executemany("DELETE FROM music_queue WHERE guild_id = ? AND seq = ?", deleted)
+                await self.conn.executemany("""
+                    INSERT OR REPLACE INTO music_queue (guild_id, seq, url, title, duration, requester_id)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, inserted)
+                await self.conn.executemany("""
+                    INSERT OR REPLACE INTO music_sessions (guild_id, voice_channel_id, text_channel_id, volume, current_seq, position)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, sessions)
+                await self.conn.commit()
+            except BaseException:
+                await self.conn.rollback()
+                raise
+
+    async def get_music_sessions(self) -> List[aiosqlite.Row]:
+        """Get every saved music session"""
+        async with self._read_conn() as conn, conn.cursor() as cursor:
+            await cursor.execute("SELECT * FROM music_sessions")
+            return await cursor.fetchall()
+
+    async def get_music_queue(self, guild_id: int) -> List[aiosqlite.Row]:
+        """Get a guild's saved tracks in queue order"""
+        async with self._read_conn() as conn, conn.cursor() as cursor:
+            await cursor.execute("SELECT * FROM music_queue WHERE guild_id = ? ORDER BY seq", (guild_id,))
+            return await cursor.fetchall()
+
+    # App Command Sync Methods
+    async def get_command_hashes(self) -> Dict[str, str]:
+        """Get the last synced command tree hash for every scope"""
+        async with self._read_conn() as conn, conn.cursor() as cursor:
+            await cursor.execute("SELECT scope, hash FROM command_sync")
+            return {row['scope']: row['hash'] for row in await cursor.fetchall()}
+    
+    async def set_command_hash(self, scope: str, digest: str):
+        """Record the command tree hash that was just synced to a scope"""
+        async with self.conn.cursor() as cursor:
+            await cursor.execute("""
+                INSERT INTO command_sync (scope, hash, synced_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(scope) DO UPDATE SET hash = excluded.hash, synced_at = excluded.synced_at
+            """, (scope, digest))
+            await self.conn.commit()
 
 # Global database instance
 db = Database()
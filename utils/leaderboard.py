@@ -0,0 +1,264 @@
+"""
+In-memory leaderboard index
+Order-statistic skip lists per (guild, field) for O(log n) top-N and rank queries
+"""
+import random
+from typing import Optional, List, Tuple, Dict, Iterable
+
+# Profile columns that get an in-memory leaderboard
+LEADERBOARD_FIELDS = ("xp", "balance", "messages")
+
+class _Node:
+    """Skip list node; width[i] is how many level-0 steps next[i] jumps"""
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, height: int, nil=None):
+        self.key = key
+        self.next = [nil] * height
+        self.width = [1] * height
+
+class RankedSkipList:
+    """Indexable skip list: insert, remove, rank and nth in expected O(log n)
+
+    Searches start at the tallest node's level rather than MAX_LEVEL; the head's
+    links above it are reset when a taller node is inserted.
+    """
+
+    MAX_LEVEL = 24  # Comfortable for ~16M entries with p = 0.5
+
+    def __init__(self, sorted_keys: Iterable = ()):
+        self._nil = _Node(None, 0)
+        self._head = _Node(None, self.MAX_LEVEL, self._nil)
+        self._size = 0
+        self._level = 1  # Levels in use
+        # Scratch space for add/remove: predecessor per level and its position
+        self._chain: List[Optional[_Node]] = [None] * self.MAX_LEVEL
+        self._steps = [0] * self.MAX_LEVEL
+        self._build(sorted_keys)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_height(self) -> int:
+        height = 1
+        while height < self.MAX_LEVEL and random.random() < 0.5:
+            height += 1
+        return height
+
+    def _build(self, sorted_keys: Iterable):
+        """Bulk-load already sorted keys in O(n)"""
+        last = [self._head] * self.MAX_LEVEL
+        last_pos = [0] * self.MAX_LEVEL
+        position = 0
+        for key in sorted_keys:
+            position += 1
+            node = _Node(key, self._random_height(), self._nil)
+            self._level = max(self._level, len(node.next))
+            for level in range(len(node.next)):
+                prev = last[level]
+                prev.next[level] = node
+                prev.width[level] = position - last_pos[level]
+                last[level] = node
+                last_pos[level] = position
+        for level in range(self._level):
+            last[level].next[level] = self._nil
+            last[level].width[level] = position + 1 - last_pos[level]
+        self._size = position
+
+    def add(self, key):
+        """Insert a key"""
+        chain, steps = self._chain, self._steps
+        node, position = self._head, 0
+        for level in reversed(range(self._level)):
+            nxt = node.next[level]
+            while nxt is not self._nil and nxt.key < key:
+                position += node.width[level]
+                node, nxt = nxt, nxt.next[level]
+            chain[level] = node
+            steps[level] = position
+
+        new = _Node(key, self._random_height(), self._nil)
+        height = len(new.next)
+        for level in range(self._level, height):
+            # Unused head level: it spans the whole list
+            self._head.next[level] = self._nil
+            self._head.width[level] = self._size + 1
+            chain[level] = self._head
+            steps[level] = 0
+        self._level = max(self._level, height)
+        for level in range(height):
+            prev = chain[level]
+            distance = position - steps[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - distance
+            prev.width[level] = distance + 1
+        for level in range(height, self._level):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        """Remove a key, raises KeyError if missing"""
+        chain = self._chain
+        node = self._head
+        for level in reversed(range(self._level)):
+            nxt = node.next[level]
+            while nxt is not self._nil and nxt.key < key:
+                node, nxt = nxt, nxt.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is self._nil or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self._level):
+            chain[level].width[level] -= 1
+        self._size -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is self._nil:
+            self._level -= 1
+
+    def replace(self, old, new):
+        """Change a key, in place when it keeps its position; raises KeyError if old is missing"""
+        node = self._head
+        for level in reversed(range(self._level)):
+            nxt = node.next[level]
+            while nxt is not self._nil and nxt.key < old:
+                node, nxt = nxt, nxt.next[level]
+        target = node.next[0]
+        if target is self._nil or target.key != old:
+            raise KeyError(old)
+        after = target.next[0]
+        if (node is self._head or node.key < new) and (after is self._nil or new < after.key):
+            target.key = new  # Small score changes rarely pass a neighbour
+            return
+        self.remove(old)
+        self.add(new)
+
+    def index(self, key) -> int:
+        """Get the 0-based position of a key, raises KeyError if missing"""
+        node, position = self._head, 0
+        for level in reversed(range(self._level)):
+            nxt = node.next[level]
+            while nxt is not self._nil and nxt.key < key:
+                position += node.width[level]
+                node, nxt = nxt, nxt.next[level]
+        target = node.next[0]
+        if target is self._nil or target.key != key:
+            raise KeyError(key)
+        return position
+
+    def slice(self, start: int, stop: int) -> List:
+        """Get keys in positions [start, stop) in O(log n + k)"""
+        start = max(start, 0)
+        stop = min(stop, self._size)
+        if start >= stop:
+            return []
+
+        # Walk to the node at position start (1-based start + 1 from head)
+        target = start + 1
+        node, position = self._head, 0
+        for level in reversed(range(self._level)):
+            while node.next[level] is not self._nil and position + node.width[level] <= target:
+                position += node.width[level]
+                node = node.next[level]
+
+        keys = []
+        for _ in range(stop - start):
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+class _Board:
+    """One ranked field of one guild.
+
+    Scores change immediately; ranks catch up on the next read, so a user who
+    chats many times between leaderboard views is repositioned once.
+    """
+    __slots__ = ("ranks", "scores", "dirty")
+
+    def __init__(self, scores: Dict[int, int]):
+        self.scores = scores
+        # Highest score first, ties broken by user id
+        self.ranks = RankedSkipList(sorted((-score, user_id) for user_id, score in scores.items()))
+        self.dirty: Dict[int, Optional[int]] = {}  # user_id -> score ranks still holds, None if unranked
+
+    def sync(self) -> RankedSkipList:
+        """Reposition users whose score changed since the last read"""
+        for user_id, ranked in self.dirty.items():
+            score = self.scores[user_id]
+            if ranked is None:
+                self.ranks.add((-score, user_id))
+            elif ranked != score:
+                self.ranks.replace((-ranked, user_id), (-score, user_id))
+        self.dirty.clear()
+        return self.ranks
+
+class LeaderboardIndex:
+    """Per-guild, per-field leaderboards kept in sync with user_profiles"""
+
+    def __init__(self):
+        self._boards: Dict[Tuple[int, str], _Board] = {}
+
+    def rebuild(self, rows: Iterable) -> int:
+        """Rebuild every board from (guild_id, user_id, xp, balance, messages) rows"""
+        scores: Dict[Tuple[int, str], Dict[int, int]] = {}
+        count = 0
+        for row in rows:
+            guild_id, user_id = row[0], row[1]
+            for offset, field in enumerate(LEADERBOARD_FIELDS, 2):
+                scores.setdefault((guild_id, field), {})[user_id] = row[offset] or 0
+            count += 1
+        self._boards = {key: _Board(board_scores) for key, board_scores in scores.items()}
+        return count
+
+    _EMPTY = _Board({})
+
+    def _board(self, guild_id: int, field: str, create: bool = False) -> _Board:
+        if field not in LEADERBOARD_FIELDS:
+            raise ValueError(f"No leaderboard for field: {field}")
+        board = self._boards.get((guild_id, field))
+        if board is None:
+            if not create:
+                return self._EMPTY
+            board = self._boards[(guild_id, field)] = _Board({})
+        return board
+
+    def add(self, guild_id: int, user_id: int, field: str, delta: int):
+        """Apply a score delta, inserting the user if needed"""
+        board = self._board(guild_id, field, create=True)
+        old = board.scores.get(user_id)
+        if old is not None and not delta:
+            return
+        if user_id not in board.dirty:
+            board.dirty[user_id] = old
+        board.scores[user_id] = (old or 0) + delta
+
+    def score(self, guild_id: int, field: str, user_id: int) -> Optional[int]:
+        """Get a user's score, None if they have no profile"""
+        return self._board(guild_id, field).scores.get(user_id)
+
+    def top(self, guild_id: int, field: str, limit: int = 10) -> List[Tuple[int, int]]:
+        """Get the top (user_id, score) pairs"""
+        return [(user_id, -score) for score, user_id in self._board(guild_id, field).sync().slice(0, limit)]
+
+    def rank(self, guild_id: int, field: str, user_id: int) -> Optional[int]:
+        """Get a user's 1-based rank, None if they have no profile"""
+        board = self._board(guild_id, field)
+        score = board.scores.get(user_id)
+        if score is None:
+            return None
+        return board.sync().index((-score, user_id)) + 1
+
+    def around(self, guild_id: int, field: str, rank: int, radius: int = 2) -> List[Tuple[int, int, int]]:
+        """Get (rank, user_id, score) entries within radius of a 1-based rank"""
+        start = max(rank - 1 - radius, 0)
+        keys = self._board(guild_id, field).sync().slice(start, rank + radius)
+        return [(start + i + 1, user_id, -score) for i, (score, user_id) in enumerate(keys)]
+
+    def size(self, guild_id: int, field: str) -> int:
+        """Get the number of ranked users"""
+        return len(self._board(guild_id, field).sync())
@@ -0,0 +1,70 @@
+"""
+Message-driven XP and leveling
+Cooldowns live in memory and XP gains go through the database write buffer
+"""
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Optional, List
+from config import Config
+from utils.database import db
+
+MAX_LEVEL = 1000
+
+def xp_for_next_level(level: int) -> int:
+    """XP needed to go from level to level + 1"""
+    return 5 * level * level + 50 * level + 100
+
+def _build_thresholds(max_level: int) -> List[int]:
+    """Total XP required to reach each level, index = level"""
+    thresholds = [0]
+    for level in range(max_level):
+        thresholds.append(thresholds[-1] + xp_for_next_level(level))
+    return thresholds
+
+LEVEL_THRESHOLDS = _build_thresholds(MAX_LEVEL)
+
+def level_for_xp(xp: int) -> int:
+    """Get the level for a total XP amount (binary search)"""
+    return bisect_right(LEVEL_THRESHOLDS, xp) - 1
+
+class LevelingEngine:
+    """Awards XP for messages and detects level-ups"""
+
+    def __init__(self, max_tracked: int = Config.XP_COOLDOWN_CACHE_SIZE):
+        # (guild_id, user_id) -> monotonic time of the last award, oldest first
+        self.cooldowns: "OrderedDict[tuple[int, int], float]" = OrderedDict()
+        self.max_tracked = max_tracked
+        self.xp_per_message = int(Config.XP_PER_MESSAGE * Config.XP_MULTIPLIER)
+        self.awarded = 0
+        self.level_ups = 0
+
+    def process(self, message) -> Optional[int]:
+        """Award XP for a message, returns the new level on level-up"""
+        guild_id = message.guild.id
+        user_id = message.author.id
+        key = (guild_id, user_id)
+        now = time.monotonic()
+
+        last = self.cooldowns.get(key)
+        if last is not None and now - last < Config.XP_COOLDOWN:
+            return None
+
+        self.cooldowns[key] = now
+        self.cooldowns.move_to_end(key)
+        if len(self.cooldowns) > self.max_tracked:
+            # Least recently awarded entry; almost always past its cooldown already
+            self.cooldowns.popitem(last=False)
+
+        old_xp = db.leaderboards.score(guild_id, "xp", user_id) or 0
+        new_xp = old_xp + self.xp_per_message
+        old_level = level_for_xp(old_xp)
+        new_level = level_for_xp(new_xp)
+
+        db.queue_xp(user_id, guild_id, self.xp_per_message, level=new_level)
+        self.awarded += 1
+
+        if new_level > old_level:
+            self.level_ups += 1
+            return new_level
+        return None
@@ -0,0 +1,142 @@
+"""
+Message pipeline
+Ordered on_message stages with per-stage latency histograms and per-guild toggles
+"""
+import bisect
+import logging
+import time
+from typing import Optional, List, Dict, Callable, Awaitable, Iterable, Set
+
+logger = logging.getLogger(__name__)
+
+# Stage callbacks return True to stop the pipeline (message handled), anything else continues
+StageCallback = Callable[..., Awaitable[Optional[bool]]]
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram in microseconds"""
+
+    BUCKETS_US = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_US) + 1)  # Last bucket is overflow
+        self.count = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, seconds: float):
+        us = seconds * 1e6
+        self.counts[bisect.bisect_left(self.BUCKETS_US, us)] += 1
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentile(self, p: float) -> float:
+        """Upper bucket bound containing the p-th percentile (max for the overflow bucket)"""
+        if not self.count:
+            return 0.0
+        target = p / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return float(self.BUCKETS_US[i]) if i < len(self.BUCKETS_US) else self.max_us
+        return self.max_us
+
+    @property
+    def mean_us(self) -> float:
+        return self.total_us / self.count if self.count else 0.0
+
+class Stage:
+    """A registered pipeline stage"""
+    __slots__ = ("name", "callback", "priority", "histogram", "stops", "errors")
+
+    def __init__(self, name: str, callback: StageCallback, priority: int):
+        self.name = name
+        self.callback = callback
+        self.priority = priority
+        self.histogram = LatencyHistogram()
+        self.stops = 0
+        self.errors = 0
+
+class MessagePipeline:
+    """Runs registered stages in priority order (lowest first) for every message"""
+
+    def __init__(self):
+        self._stages: Dict[str, Stage] = {}
+        self._chain: tuple = ()
+        # Only guilds with disabled stages get their own precomputed chain
+        self._disabled: Dict[int, Set[str]] = {}
+        self._guild_chains: Dict[int, tuple] = {}
+
+    def add_stage(self, name: str, callback: StageCallback, priority: int = 100):
+        """Register (or replace) a stage"""
+        self._stages[name] = Stage(name, callback, priority)
+        self._rebuild()
+
+    def remove_stage(self, name: str):
+        """Unregister a stage, e.g. from Cog.cog_unload"""
+        if self._stages.pop(name, None):
+            self._rebuild()
+
+    @property
+    def stages(self) -> List[Stage]:
+        return list(self._chain)
+
+    def _rebuild(self):
+        self._chain = tuple(sorted(self._stages.values(), key=lambda stage: (stage.priority, stage.name)))
+        self._guild_chains = {
+            guild_id: tuple(stage for stage in self._chain if stage.name not in names)
+            for guild_id, names in self._disabled.items() if names
+        }
+
+    def set_disabled(self, guild_id: int, names: Iterable[str]):
+        """Set which stages are skipped for a guild"""
+        names = set(names)
+        if names:
+            self._disabled[guild_id] = names
+        else:
+            self._disabled.pop(guild_id, None)
+        self._rebuild()
+
+    def disabled_for(self, guild_id: int) -> Set[str]:
+        return set(self._disabled.get(guild_id, ()))
+
+    async def run(self, message) -> Optional[str]:
+        """Run the message through every enabled stage, returns the name of the stage that stopped it"""
+        chain = self._chain
+        if message.guild is not None and self._guild_chains:
+            chain = self._guild_chains.get(message.guild.id, chain)
+
+        perf_counter = time.perf_counter
+        for stage in chain:
+            start = perf_counter()
+            try:
+                stop = await stage.callback(message)
+            except Exception as e:
+                stage.errors += 1
+                logger.error(f"Message stage {stage.name} failed: {e}", exc_info=e)
+                stop = False
+            stage.histogram.record(perf_counter() - start)
+            if stop is True:
+                stage.stops += 1
+                return stage.name
+        return None
+
+    def report(self) -> List[dict]:
+        """Per-stage latency summary, in pipeline order"""
+        return [
+            {
+                "name": stage.name,
+                "priority": stage.priority,
+                "count": stage.histogram.count,
+                "stops": stage.stops,
+                "errors": stage.errors,
+                "mean_us": stage.histogram.mean_us,
+                "p50_us": stage.histogram.percentile(50),
+                "p99_us": stage.histogram.percentile(99),
+                "max_us": stage.histogram.max_us,
+                "total_ms": stage.histogram.total_us / 1000,
+            }
+            for stage in self._chain
+        ]
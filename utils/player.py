@@ -0,0 +1,305 @@
+"""
+Music player
+Per-guild queue and playback loop, independent of any command context
+"""
+import discord
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional, Callable, Awaitable, List, Set, Tuple, Coroutine, TYPE_CHECKING
+from urllib.parse import urlparse, parse_qs
+from config import Config
+from utils.embeds import Embeds
+
+if TYPE_CHECKING:
+    from utils.queue_store import QueueStore
+
+logger = logging.getLogger(__name__)
+
+def stream_expiry(stream_url: str) -> Optional[float]:
+    """Unix time a direct media URL stops working, from its expire query parameter"""
+    values = parse_qs(urlparse(stream_url).query).get("expire")
+    if not values:
+        return None
+    try:
+        return float(values[0])
+    except ValueError:
+        return None
+
+class Track:
+    """A queued song"""
+    __slots__ = ("url", "title", "requester", "duration", "stream_url", "expires_at", "codec", "seq")
+
+    def __init__(self, url: str, title: str, requester: Optional[discord.abc.User] = None, duration: Optional[int] = None):
+        self.url = url
+        self.title = title
+        self.requester = requester
+        self.duration = duration
+        self.stream_url: Optional[str] = None  # Direct media URL, set once resolved
+        self.expires_at: Optional[float] = None
+        self.codec: Optional[str] = None  # Audio codec of the stream, if the extractor reported it
+        self.seq: Optional[int] = None  # Queue order key once saved by the queue store
+
+    def set_stream(self, stream_url: str, codec: Optional[str] = None):
+        self.stream_url = stream_url
+        self.expires_at = stream_expiry(stream_url)
+        self.codec = codec
+
+    def needs_resolve(self) -> bool:
+        """True if there is no stream URL yet, or it would expire before the track finishes"""
+        if self.stream_url is None:
+            return True
+        if self.expires_at is None:
+            return False
+        return self.expires_at < time.time() + (self.duration or 0) + Config.MUSIC_STREAM_REFRESH_MARGIN
+
+# Sets track.stream_url (the slow yt-dlp extraction)
+Resolver = Callable[[Track], Awaitable[None]]
+# Opens the playable audio source for a resolved track at a volume and offset in seconds
+SourceFactory = Callable[[Track, float, float], Awaitable[discord.AudioSource]]
+
+class GuildPlayer:
+    """Owns one guild's queue, current track and volume, and plays the queue in a background task"""
+
+    def __init__(self, bot, guild: discord.Guild, resolver: Resolver, source_factory: SourceFactory,
+                 channel: Optional[discord.abc.Messageable] = None,
+                 volume: float = Config.MUSIC_DEFAULT_VOLUME, max_size: int = Config.MUSIC_MAX_QUEUE_SIZE,
+                 store: Optional["QueueStore"] = None):
+        self.bot = bot
+        self.guild = guild
+        self.resolver = resolver
+        self.source_factory = source_factory
+        self.channel = channel  # Where now playing messages go
+        self.volume = volume
+        self.max_size = max_size
+        self.store = store  # Saves queue changes, if set
+        self.queue: "deque[Track]" = deque()
+        self.current: Optional[Track] = None
+        self._queue_ready = asyncio.Event()
+        self._track_done = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # The next track is resolved while the current one plays
+        self._prefetch: Optional[Track] = None
+        self._prefetch_task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()  # e.g. playlist loaders, cancelled with the player
+        self.resume: Optional[Tuple[Track, float]] = None  # Restored track to start at an offset in seconds
+        self.stats = {"played": 0, "prefetched": 0, "refreshed": 0, "restarts": 0, "last_gap_ms": 0.0}
+
+    @property
+    def voice_client(self) -> Optional[discord.VoiceClient]:
+        return self.guild.voice_client
+
+    @property
+    def is_active(self) -> bool:
+        return self.current is not None or bool(self.queue)
+
+    def enqueue(self, track: Track) -> Optional[int]:
+        """Add a track to the end of the queue, returns its position or None if the queue is full"""
+        if len(self.queue) >= self.max_size:
+            return None
+        self.queue.append(track)
+        if self.store is not None:
+            self.store.add(self.guild.id, track)
+        self._queue_ready.set()
+        self.start()
+        if self.current is not None:
+            self._prefetch_next()
+        return len(self.queue)
+
+    def skip(self) -> bool:
+        """Stop the current track, the loop moves on to the next one"""
+        voice_client = self.voice_client
+        if voice_client is None or not (voice_client.is_playing() or voice_client.is_paused()):
+            return False
+        voice_client.stop()
+        return True
+
+    def clear(self) -> int:
+        """Drop every queued track, returns how many were removed"""
+        count = len(self.queue)
+        if self.store is not None:
+            for track in self.queue:
+                self.store.remove(self.guild.id, track)
+        self.queue.clear()
+        self.resume = None
+        return count
+
+    def remove(self, position: int) -> Optional[Track]:
+        """Remove the track at a 1-based queue position"""
+        if not 1 <= position <= len(self.queue):
+            return None
+        track = self.queue[position - 1]
+        del self.queue[position - 1]
+        self._forget(track)
+        return track
+
+    def restore(self, tracks: List[Track], offset: float = 0.0):
+        """Queue tracks that were saved before a restart, the first one starting offset seconds in"""
+        kept, dropped = tracks[:self.max_size], tracks[self.max_size:]
+        self.queue.extend(kept)
+        if self.store is not None:
+            for track in kept:
+                self.store.add(self.guild.id, track)  # Same seq, so the saved row is kept
+            for track in dropped:
+                self.store.remove(self.guild.id, track)  # Over the queue limit
+        if self.queue and offset:
+            self.resume = (self.queue[0], offset)
+        self._queue_ready.set()
+        self.start()
+
+    def _forget(self, track: Track):
+        if self.store is not None:
+            self.store.remove(self.guild.id, track)
+
+    def upcoming(self, limit: int = 10) -> List[Track]:
+        """The next tracks in the queue"""
+        return [self.queue[i] for i in range(min(limit, len(self.queue)))]
+
+    @property
+    def position(self) -> float:
+        """Seconds into the current track"""
+        source = self.voice_client.source if self.voice_client else None
+        return getattr(source, "position", 0.0)
+
+    def set_volume(self, volume: float):
+        """Set the volume for the current and following tracks"""
+        self.volume = volume
+        source = self.voice_client.source if self.voice_client else None
+        if isinstance(source, discord.PCMVolumeTransformer):
+            source.volume = volume
+        elif source is not None and self.current is not None:
+            # Passthrough Opus can't be scaled; reopen the track with the new volume
+            self.run_in_background(self._restart_source())
+
+    async def _restart_source(self):
+        """Reopen the current track where it is, e.g. as PCM after a volume change"""
+        track, voice_client = self.current, self.voice_client
+        old = voice_client.source
+        new = await self.source_factory(track, self.volume, self.position)
+        if self.current is not track or self.voice_client is not voice_client or voice_client.source is not old:
+            new.cleanup()  # Track changed meanwhile
+            return
+        voice_client.source = new  # Swapped in the voice thread, the after callback stays
+        old.cleanup()
+        self.stats["restarts"] += 1
+
+    @property
+    def free_slots(self) -> int:
+        return max(0, self.max_size - len(self.queue))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    def run_in_background(self, coro: Coroutine) -> asyncio.Task:
+        """Run a task tied to this player's lifetime"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def destroy(self, disconnect: bool = True):
+        """Stop playback and the loop, and leave voice unless disconnect is False (the saved queue is kept)"""
+        self.queue.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+            self._prefetch_task = None
+        for task in list(self._background):
+            task.cancel()
+        self.current = None
+        voice_client = self.voice_client
+        if voice_client is not None:
+            voice_client.stop()
+            if disconnect:
+                await voice_client.disconnect()
+
+    async def _loop(self):
+        """Play queued tracks one after another"""
+        while True:
+            if not self.queue:
+                self._queue_ready.clear()
+                await self._queue_ready.wait()
+                continue
+
+            track = self.queue.popleft()
+            offset = self.resume[1] if self.resume is not None and self.resume[0] is track else 0.0
+            if self.voice_client is None:
+                self._forget(track)
+                continue  # Disconnected, nothing to play on
+
+            ended = time.perf_counter()
+            try:
+                await self._prepare(track)
+                source = await self.source_factory(track, self.volume, offset)
+            except Exception as e:
+                logger.error(f"Failed to load {track.url} in guild {self.guild.id}: {e}")
+                self._forget(track)
+                await self.announce(f"❌ Couldn't play **{track.title}**: {e}")
+                continue
+
+            voice_client = self.voice_client
+            if voice_client is None:
+                source.cleanup()
+                self._forget(track)
+                continue
+
+            self.current = track
+            self.resume = None
+            self._track_done.clear()
+            voice_client.play(source, after=self._after)
+            self.stats["played"] += 1
+            self.stats["last_gap_ms"] = (time.perf_counter() - ended) * 1000
+            self._prefetch_next()
+            if track.requester is not None:
+                await self.announce(embed=Embeds.music_now_playing(track.title, track.url, track.requester))
+            await self._track_done.wait()
+            self.current = None
+            self._forget(track)
+
+    async def _prepare(self, track: Track):
+        """Make sure a track has a stream URL that outlives it"""
+        if track is self._prefetch and self._prefetch_task is not None:
+            await asyncio.wait([self._prefetch_task])
+        if track.needs_resolve():
+            if track.stream_url is not None:
+                self.stats["refreshed"] += 1
+            await self.resolver(track)
+
+    def _prefetch_next(self):
+        """Resolve the head of the queue in the background"""
+        if not self.queue:
+            return
+        track = self.queue[0]
+        if track is self._prefetch or not track.needs_resolve():
+            return
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._prefetch = track
+        self._prefetch_task = asyncio.create_task(self._prefetch_track(track))
+
+    async def _prefetch_track(self, track: Track):
+        try:
+            await self.resolver(track)
+            self.stats["prefetched"] += 1
+        except Exception as e:
+            # Retried (and reported) when the track comes up
+            logger.warning(f"Prefetch of {track.url} failed in guild {self.guild.id}: {e}")
+
+    def _after(self, error: Optional[Exception]):
+        """Called from the voice thread when a track ends"""
+        if error:
+            logger.error(f"Player error in guild {self.guild.id}: {error}")
+        self.bot.loop.call_soon_threadsafe(self._track_done.set)
+
+    async def announce(self, content: Optional[str] = None, **kwargs):
+        """Post to the player's text channel, ignoring failures"""
+        if self.channel is None:
+            return
+        try:
+            await self.channel.send(content, **kwargs)
+        except discord.HTTPException as e:
+            logger.warning(f"Failed to send music message in guild {self.guild.id}: {e}")
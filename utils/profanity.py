@@ -0,0 +1,271 @@
+"""
+Bad word matching
+Compiles the word list into one Aho-Corasick automaton so a scan is linear in message length
+"""
+import aiohttp
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Optional, Iterable, List, Tuple, Dict, Set
+
+logger = logging.getLogger(__name__)
+
+# Leetspeak and look-alike characters folded before matching
+LEET_MAP = str.maketrans({
+    "0": "o",
+    "1": "i",
+    "3": "e",
+    "4": "a",
+    "5": "s",
+    "7": "t",
+    "8": "b",
+    "@": "a",
+    "$": "s",
+    "!": "i",
+    "|": "l",
+    "+": "t",
+})
+
+def normalize(text: str) -> str:
+    """Lowercase and fold leetspeak so 'B4D' and 'bad' compare equal"""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters expand when lowercased; keep positions aligned with the input
+        lowered = "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+    return lowered.translate(LEET_MAP)
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum()
+
+class ProfanityMatcher:
+    """Aho-Corasick automaton over a normalized word set"""
+
+    def __init__(self, words: Iterable[str] = ()):
+        self.word_count = 0
+        self._compile(words)
+
+    def _compile(self, words: Iterable[str]):
+        goto: List[dict] = [{}]
+        fail: List[int] = [0]
+        # Lengths of the patterns that end at each state
+        out: List[Tuple[int, ...]] = [()]
+
+        for word in words:
+            word = normalize(word.strip())
+            if not word:
+                continue
+            state = 0
+            for char in word:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append(())
+                state = nxt
+            if len(word) not in out[state]:
+                out[state] += (len(word),)
+                self.word_count += 1
+
+        # Breadth-first fail links; outputs are merged along the fail chain
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                fallback = goto[f].get(char, 0)
+                fail[nxt] = fallback if fallback != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] += out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def _scan(self, message: str, first_only: bool) -> List[Tuple[int, int]]:
+        """Find (start, end) spans of whole-word matches in a message"""
+        goto, fail, out = self._goto, self._fail, self._out
+        length = len(message)
+        matches = []
+        state = 0
+        for i, char in enumerate(normalize(message)):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            # Word boundary rules: the match must not be glued to other letters/digits.
+            # Neighbours are checked as written, so 'ass!' matches but 'class' does not.
+            if i + 1 < length and _is_word_char(message[i + 1]):
+                continue
+            for size in out[state]:
+                start = i - size + 1
+                if start == 0 or not _is_word_char(message[start - 1]):
+                    matches.append((start, i + 1))
+                    if first_only:
+                        return matches
+        return matches
+
+    def contains(self, message: str) -> bool:
+        """Check if a message contains any listed word"""
+        if not self.word_count or not message:
+            return False
+        return bool(self._scan(message, first_only=True))
+
+    def find(self, message: str) -> List[str]:
+        """Get every listed word found in a message, as written"""
+        if not self.word_count or not message:
+            return []
+        # Normalization keeps positions, so spans map back onto the original text
+        return [message[start:end] for start, end in self._scan(message, first_only=False)]
+
+    def censor(self, message: str, mask: str = "*") -> str:
+        """Replace listed words in a message with the mask character"""
+        if not self.word_count or not message:
+            return message
+        chars = list(message)
+        for start, end in self._scan(message, first_only=False):
+            chars[start:end] = mask * (end - start)
+        return "".join(chars)
+
+class BadWordsLoader:
+    """
+    Keeps the bad word matcher loaded from an on-disk cache and refreshes it in the background.
+    Refreshes use conditional requests (ETag / Last-Modified) and swap the matcher in one assignment.
+    """
+
+    def __init__(self, urls: Iterable[str], cache_dir: str, refresh_interval: float):
+        self.urls = list(urls)
+        self.cache_dir = cache_dir
+        self.refresh_interval = refresh_interval
+        self.matcher = ProfanityMatcher()
+        self.last_refresh: Optional[float] = None
+        self._words: Dict[str, Set[str]] = {}  # url -> words
+        self._task: Optional[asyncio.Task] = None
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        """Cache file and metadata file for a source URL"""
+        name = hashlib.sha1(url.encode()).hexdigest()[:16]
+        base = os.path.join(self.cache_dir, name)
+        return base + ".txt", base + ".json"
+
+    @staticmethod
+    def _parse(text: str) -> Set[str]:
+        return set(word.strip().lower() for word in text.split('\n') if word.strip())
+
+    @property
+    def words(self) -> Set[str]:
+        """All words across every source"""
+        return set().union(*self._words.values()) if self._words else set()
+
+    def load_cached(self) -> int:
+        """Build the matcher from the disk cache only (no network), returns the word count"""
+        for url in self.urls:
+            words_path, _ = self._paths(url)
+            try:
+                with open(words_path, encoding="utf-8") as f:
+                    self._words[url] = self._parse(f.read())
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"Could not read bad word cache for {url}: {e}")
+        self.matcher = ProfanityMatcher(self.words)
+        return self.matcher.word_count
+
+    def _read_meta(self, url: str) -> dict:
+        _, meta_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, url: str, text: str, meta: dict):
+        """Atomically replace the cached list and its validators"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        words_path, meta_path = self._paths(url)
+        for path, data in ((words_path, text), (meta_path, json.dumps(meta))):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> bool:
+        """Conditionally fetch one source, returns True if its words changed"""
+        meta = self._read_meta(url) if url in self._words else {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304:
+                return False
+            if response.status != 200:
+                logger.warning(f"Bad word list {url} returned HTTP {response.status}")
+                return False
+            text = await response.text()
+            new_meta = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+
+        words = self._parse(text)
+        if not words:
+            logger.warning(f"Bad word list {url} was empty, keeping the cached copy")
+            return False
+        await asyncio.to_thread(self._write_cache, url, text, new_meta)
+        changed = words != self._words.get(url)
+        self._words[url] = words
+        return changed
+
+    async def refresh(self) -> bool:
+        """Refresh every source and swap in a new matcher if anything changed"""
+        changed = False
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            for url in self.urls:
+                try:
+                    changed = await self._fetch(session, url) or changed
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                    logger.warning(f"Failed to refresh bad word list {url}: {e}")
+
+        if changed:
+            # Compile off the event loop, then publish with a single reference swap
+            matcher = await asyncio.to_thread(ProfanityMatcher, self.words)
+            self.matcher = matcher
+            logger.info(f"Bad word filter updated ({matcher.word_count} words)")
+        self.last_refresh = time.time()
+        return changed
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Bad word refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Start refreshing in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    def stop(self):
+        """Stop the background refresh"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def contains(self, message: str) -> bool:
+        """Check a message against the current matcher"""
+        return self.matcher.contains(message)
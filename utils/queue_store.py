@@ -0,0 +1,122 @@
+"""
+Music queue store
+Write-behind persistence of music queues, so they survive restarts and cog reloads
+"""
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Tuple, Set, Mapping, Iterable, TYPE_CHECKING
+from config import Config
+from utils.database import db
+
+if TYPE_CHECKING:
+    from utils.player import GuildPlayer, Track
+
+logger = logging.getLogger(__name__)
+
+class QueueStore:
+    """Buffers queue changes per track and writes them on a timer.
+
+    Each saved track gets a seq (time-based, so it keeps increasing across restarts)
+    that orders the queue. Adding or removing a track is one row; the session row
+    holds the volume, channels and how far into the current track playback is.
+    """
+
+    def __init__(self, players: Mapping[int, "GuildPlayer"], interval: int = Config.MUSIC_QUEUE_SAVE_INTERVAL):
+        self.players = players  # The music cog's guild_id -> GuildPlayer
+        self.interval = interval
+        self._last_seq = 0
+        self._inserted: Dict[Tuple[int, int], tuple] = {}  # (guild_id, seq) -> row
+        self._deleted: Set[Tuple[int, int]] = set()
+        self._dropped: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"flushes": 0, "rows_written": 0, "failed": 0}
+
+    def next_seq(self) -> int:
+        self._last_seq = max(time.time_ns(), self._last_seq + 1)
+        return self._last_seq
+
+    def add(self, guild_id: int, track: "Track"):
+        """Save a queued track; restored tracks keep their seq, so this rewrites the same row"""
+        if track.seq is None:
+            track.seq = self.next_seq()
+        else:
+            self._last_seq = max(self._last_seq, track.seq)
+        requester_id = track.requester.id if track.requester else None
+        self._inserted[(guild_id, track.seq)] = (guild_id, track.seq, track.url, track.title, track.duration, requester_id)
+
+    def remove(self, guild_id: int, track: "Track"):
+        """Forget a finished, skipped or removed track"""
+        if track.seq is not None:
+            self.remove_rows(guild_id, [track.seq])
+
+    def remove_rows(self, guild_id: int, seqs: Iterable[int]):
+        """Forget saved rows by seq, e.g. a stale queue that was never restored"""
+        for seq in seqs:
+            key = (guild_id, seq)
+            if self._inserted.pop(key, None) is None:
+                self._deleted.add(key)
+
+    def drop(self, guild_id: int):
+        """Forget a guild's whole session, e.g. after stop or leaving voice"""
+        self._dropped.add(guild_id)
+        self._inserted = {key: row for key, row in self._inserted.items() if key[0] != guild_id}
+        self._deleted = {key for key in self._deleted if key[0] != guild_id}
+
+    def session(self, player: "GuildPlayer") -> Optional[tuple]:
+        """The session row for a connected player"""
+        voice_client = player.voice_client
+        if voice_client is None or voice_client.channel is None:
+            return None
+        if player.current is not None:
+            current_seq, position = player.current.seq, player.position
+        elif player.resume is not None:
+            current_seq, position = player.resume[0].seq, player.resume[1]  # Restored, not playing yet
+        else:
+            current_seq, position = None, 0.0
+        text_channel_id = getattr(player.channel, "id", None)
+        return (player.guild.id, voice_client.channel.id, text_channel_id, player.volume, current_seq, position)
+
+    async def flush(self) -> int:
+        """Write pending changes and every player's current position"""
+        dropped, deleted, inserted = list(self._dropped), list(self._deleted), list(self._inserted.values())
+        self._dropped, self._deleted, self._inserted = set(), set(), {}
+        sessions = [row for row in map(self.session, list(self.players.values())) if row is not None]
+        saved = False
+        try:
+            await db.save_music_changes(dropped, deleted, inserted, sessions)
+            saved = True
+        finally:
+            if not saved:
+                # Failed or cancelled: retry with the next flush; changes made since are newer and win
+                self._dropped.update(dropped)
+                self._deleted.update(key for key in deleted if key not in self._inserted)
+                for row in inserted:
+                    self._inserted.setdefault((row[0], row[1]), row)
+                self.stats["failed"] += 1
+        rows = len(deleted) + len(inserted) + len(sessions)
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += rows
+        return rows
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        """Stop the timer and write everything, positions included"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to save music queues: {e}")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to save music queues: {e}")
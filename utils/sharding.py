@@ -0,0 +1,164 @@
+"""
+Sharding helpers
+Shard range planning, per-shard stats and the localhost IPC channel between cluster processes
+"""
+import aiohttp
+import asyncio
+import logging
+import math
+import time
+from aiohttp import web
+from typing import Optional, List, Dict, Tuple, Callable, Awaitable
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+IPCHandler = Callable[[], Awaitable[dict]]
+
+def shard_ranges(shard_count: int, cluster_count: int) -> List[List[int]]:
+    """Split shard ids 0..shard_count-1 into contiguous ranges, one per cluster"""
+    cluster_count = max(1, min(cluster_count, shard_count))
+    base, extra = divmod(shard_count, cluster_count)
+    ranges = []
+    start = 0
+    for cluster_id in range(cluster_count):
+        size = base + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+def _finite_ms(seconds: float) -> Optional[float]:
+    return round(seconds * 1000, 1) if math.isfinite(seconds) else None
+
+class ShardMonitor:
+    """Samples per-shard heartbeat latency and gateway event rate"""
+
+    def __init__(self, bot, interval: int = Config.SHARD_STATS_INTERVAL):
+        self.bot = bot
+        self.interval = interval
+        self._last: Dict[int, Tuple[float, int]] = {}  # shard_id -> (sampled_at, sequence)
+        self.rates: Dict[int, float] = {}  # shard_id -> events/s
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self):
+        """Update event rates from each shard's gateway sequence number.
+
+        The sequence counts dispatched events per session, so sampling it costs
+        nothing per event. It restarts on a new session, which just skips one sample.
+        """
+        now = time.monotonic()
+        for shard_id, shard in self.bot.shards.items():
+            ws = getattr(getattr(shard, "_parent", None), "ws", None)
+            sequence = getattr(ws, "sequence", None) or 0
+            previous = self._last.get(shard_id)
+            if previous is not None and sequence >= previous[1] and now > previous[0]:
+                self.rates[shard_id] = (sequence - previous[1]) / (now - previous[0])
+            self._last[shard_id] = (now, sequence)
+
+    def report(self) -> List[dict]:
+        """Per-shard latency, event rate and guild count"""
+        guilds: Dict[int, int] = {}
+        for guild in self.bot.guilds:
+            guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+        return [
+            {
+                "shard_id": shard_id,
+                "latency_ms": _finite_ms(shard.latency),
+                "events_per_s": round(self.rates.get(shard_id, 0.0), 2),
+                "guilds": guilds.get(shard_id, 0),
+                "closed": shard.is_closed(),
+            }
+            for shard_id, shard in sorted(self.bot.shards.items())
+        ]
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        self.sample()  # Baseline; each later sample measures the interval since the previous one
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sample()
+            for shard in self.report():
+                logger.info(
+                    f"Shard {shard['shard_id']}: latency {shard['latency_ms']} ms, "
+                    f"{shard['events_per_s']} events/s, {shard['guilds']} guilds"
+                )
+
+class ClusterIPC:
+    """Request/response channel between cluster processes over localhost HTTP"""
+
+    def __init__(self, cluster_id: int = 0, cluster_count: int = 1, secret: str = ""):
+        self.cluster_id = cluster_id
+        self.cluster_count = cluster_count
+        self.secret = secret
+        self.handlers: Dict[str, IPCHandler] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.cluster_count > 1
+
+    def port(self, cluster_id: int) -> int:
+        return Config.IPC_BASE_PORT + cluster_id
+
+    def register(self, name: str, handler: IPCHandler):
+        """Expose a coroutine returning a JSON-serializable dict to the other clusters"""
+        self.handlers[name] = handler
+
+    async def start(self):
+        """Start listening (no-op when running as a single process)"""
+        if not self.enabled:
+            return
+        app = web.Application()
+        app.router.add_get("/ipc/{name}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, Config.IPC_HOST, self.port(self.cluster_id)).start()
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=Config.IPC_TIMEOUT))
+        logger.info(f"Cluster {self.cluster_id} IPC listening on port {self.port(self.cluster_id)}")
+
+    async def stop(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if request.headers.get("X-IPC-Secret") != self.secret:
+            return web.json_response({"error": "unauthorized"}, status=401)
+        handler = self.handlers.get(request.match_info["name"])
+        if handler is None:
+            return web.json_response({"error": "unknown handler"}, status=404)
+        return web.json_response(await handler())
+
+    async def request(self, cluster_id: int, name: str) -> Optional[dict]:
+        """Call a handler on one cluster, None if it is unreachable"""
+        if cluster_id == self.cluster_id:
+            return await self.handlers[name]()
+        if self._session is None:
+            return None
+        url = f"http://{Config.IPC_HOST}:{self.port(cluster_id)}/ipc/{name}"
+        try:
+            async with self._session.get(url, headers={"X-IPC-Secret": self.secret}) as response:
+                if response.status != 200:
+                    logger.warning(f"IPC {name} on cluster {cluster_id} returned {response.status}")
+                    return None
+                return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"IPC {name} on cluster {cluster_id} failed: {e}")
+            return None
+
+    async def gather(self, name: str) -> List[dict]:
+        """Call a handler on every cluster, skipping the unreachable ones"""
+        results = await asyncio.gather(*(self.request(cluster_id, name) for cluster_id in range(self.cluster_count)))
+        return [result for result in results if result is not None]
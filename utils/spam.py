@@ -0,0 +1,215 @@
+"""
+Spam detection
+Sliding-window rate limiting per (guild, user) with bounded memory
+"""
+import discord
+import asyncio
+import datetime
+import heapq
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Optional, List, Tuple, Dict
+from config import Config
+from utils.database import db
+
+logger = logging.getLogger(__name__)
+
+class _Window:
+    """Ring buffers of the most recent threshold + 1 messages of one user"""
+    __slots__ = ("times", "message_ids", "channel_ids", "last_seen")
+
+    def __init__(self, size: int):
+        self.times = deque(maxlen=size)
+        self.message_ids = deque(maxlen=size)
+        self.channel_ids = deque(maxlen=size)
+        self.last_seen = 0.0
+
+    def push(self, now: float, message_id: int, channel_id: int):
+        self.times.append(now)
+        self.message_ids.append(message_id)
+        self.channel_ids.append(channel_id)
+        self.last_seen = now
+
+class SpamDetector:
+    """Spam detection system"""
+
+    def __init__(self, bot=None):
+        self.bot = bot
+        # (guild_id, user_id) -> _Window, least recently active first
+        self.windows: "OrderedDict[Tuple[int, int], _Window]" = OrderedDict()
+        self.muted_users = set()  # (guild_id, user_id)
+        self.THRESHOLD = Config.SPAM_THRESHOLD
+        self.TIME_WINDOW = Config.SPAM_TIME_WINDOW
+        self.MUTE_DURATION = Config.SPAM_MUTE_DURATION
+        self.max_tracked = Config.SPAM_MAX_TRACKED
+        self.idle_ttl = Config.SPAM_IDLE_TTL
+        
+        # Punishments run in a background worker so on_message never waits on them
+        self.enforcement_queue: asyncio.Queue = asyncio.Queue(maxsize=Config.SPAM_ENFORCEMENT_QUEUE_SIZE)
+        self._unmutes: List[Tuple[float, int, int, int]] = []  # heap of (unmute_at, guild, user, channel)
+        self._unmute_wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"punished": 0, "bulk_deletes": 0, "deleted_messages": 0, "dropped": 0}
+
+    def get_limits(self, guild_id: int) -> Tuple[int, int]:
+        """Get (threshold, time window) for a guild, falling back to Config"""
+        threshold = db.get_server_setting(guild_id, "spam_threshold") or self.THRESHOLD
+        window = db.get_server_setting(guild_id, "spam_time_window") or self.TIME_WINDOW
+        return threshold, window
+
+    def _evict(self, now: float):
+        """Drop idle windows from the LRU end, and the oldest ones if over capacity"""
+        windows = self.windows
+        while windows:
+            window = next(iter(windows.values()))
+            if len(windows) <= self.max_tracked and now - window.last_seen < self.idle_ttl:
+                break
+            windows.popitem(last=False)
+
+    def record(self, guild_id: int, user_id: int, message_id: int, channel_id: int, now: Optional[float] = None) -> bool:
+        """Record a message, returns True if the user is over the limit"""
+        now = time.monotonic() if now is None else now
+        threshold, time_window = self.get_limits(guild_id)
+        key = (guild_id, user_id)
+
+        window = self.windows.get(key)
+        if window is None or window.times.maxlen != threshold + 1:
+            window = self.windows[key] = _Window(threshold + 1)
+        else:
+            self.windows.move_to_end(key)
+        window.push(now, message_id, channel_id)
+        self._evict(now)
+
+        # Over the limit when threshold + 1 messages fit inside the window
+        return len(window.times) > threshold and now - window.times[0] <= time_window
+
+    def recent_messages(self, guild_id: int, user_id: int) -> List[Tuple[int, int]]:
+        """Get (channel_id, message_id) pairs still in a user's window"""
+        window = self.windows.get((guild_id, user_id))
+        if window is None:
+            return []
+        return list(zip(window.channel_ids, window.message_ids))
+
+    async def start(self):
+        """Restore the unmute schedule and start the enforcement tasks"""
+        for row in await db.get_spam_mutes():
+            heapq.heappush(self._unmutes, (row['unmute_at'], row['guild_id'], row['user_id'], row['channel_id']))
+            self.muted_users.add((row['guild_id'], row['user_id']))
+        self._tasks = [
+            asyncio.create_task(self._enforcement_worker()),
+            asyncio.create_task(self._unmute_scheduler()),
+        ]
+
+    def stop(self):
+        """Stop the enforcement tasks (the unmute schedule is persisted)"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def check_spam(self, message):
+        """Check if a message is spam, punishment happens off the message path"""
+        if not message.guild:
+            return False
+
+        guild_id = message.guild.id
+        user_id = message.author.id
+        if not self.record(guild_id, user_id, message.id, message.channel.id):
+            return False
+
+        key = (guild_id, user_id)
+        if key not in self.muted_users:
+            self.muted_users.add(key)
+            job = (message.guild, message.author, message.channel, self.recent_messages(guild_id, user_id))
+            try:
+                self.enforcement_queue.put_nowait(job)
+            except asyncio.QueueFull:
+                # Still report spam; the user can be picked up on their next message
+                self.muted_users.discard(key)
+                self.stats["dropped"] += 1
+        return True
+
+    async def _enforcement_worker(self):
+        """Apply queued punishments one at a time"""
+        while True:
+            job = await self.enforcement_queue.get()
+            try:
+                await self.punish(*job)
+            except Exception as e:
+                logger.error(f"Error muting user: {e}")
+                self.muted_users.discard((job[0].id, job[1].id))
+            finally:
+                self.enforcement_queue.task_done()
+
+    async def punish(self, guild: discord.Guild, member: discord.Member, channel, messages: List[Tuple[int, int]]):
+        """Bulk-delete a spam burst and time the member out"""
+        key = (guild.id, member.id)
+
+        # One bulk delete per channel instead of one request per message
+        by_channel: Dict[int, List[discord.Object]] = {}
+        for channel_id, message_id in messages:
+            by_channel.setdefault(channel_id, []).append(discord.Object(id=message_id))
+        for channel_id, targets in by_channel.items():
+            target_channel = guild.get_channel_or_thread(channel_id)
+            if target_channel is None:
+                continue
+            try:
+                await target_channel.delete_messages(targets, reason="Spam")
+                self.stats["bulk_deletes"] += 1
+                self.stats["deleted_messages"] += len(targets)
+            except discord.HTTPException as e:
+                logger.warning(f"Failed to delete spam in {channel_id}: {e}")
+
+        # Native timeout: no Muted role, no per-channel overwrites, Discord lifts it itself
+        try:
+            await member.timeout(datetime.timedelta(seconds=self.MUTE_DURATION), reason="Spamming")
+        except discord.Forbidden:
+            self.muted_users.discard(key)
+            await channel.send("I don't have permission to mute users.")
+            return
+
+        unmute_at = time.time() + self.MUTE_DURATION
+        await db.add_spam_mute(guild.id, member.id, channel.id, unmute_at)
+        heapq.heappush(self._unmutes, (unmute_at, guild.id, member.id, channel.id))
+        self._unmute_wakeup.set()
+        self.stats["punished"] += 1
+
+        await channel.send(
+            f"{member.mention} has been muted for {self.MUTE_DURATION} seconds due to spamming."
+        )
+
+    async def _unmute_scheduler(self):
+        """Single task that sleeps until the next scheduled unmute"""
+        while True:
+            if not self._unmutes:
+                self._unmute_wakeup.clear()
+                await self._unmute_wakeup.wait()
+                continue
+
+            delay = self._unmutes[0][0] - time.time()
+            if delay > 0:
+                self._unmute_wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._unmute_wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, guild_id, user_id, channel_id = heapq.heappop(self._unmutes)
+            try:
+                await self._lift(guild_id, user_id, channel_id)
+            except Exception as e:
+                logger.error(f"Error lifting spam mute: {e}")
+
+    async def _lift(self, guild_id: int, user_id: int, channel_id: int):
+        """Forget a finished mute and announce it"""
+        self.muted_users.discard((guild_id, user_id))
+        await db.remove_spam_mute(guild_id, user_id)
+
+        guild = self.bot.get_guild(guild_id) if self.bot else None
+        channel = guild.get_channel_or_thread(channel_id) if guild else None
+        if channel is not None:
+            try:
+                await channel.send(f"<@{user_id}>'s mute has been lifted.")
+            except discord.HTTPException:
+                pass
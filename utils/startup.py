@@ -0,0 +1,66 @@
+"""
+Startup profiling
+Summarizes `python -X importtime` output so cold start can be kept under Config.COLD_START_TARGET_MS
+"""
+import os
+import subprocess
+import sys
+from typing import List, Tuple, Iterable
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int]]:
+    """Parse -X importtime stderr into (module, self_us, cumulative_us) rows"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # Header line
+        rows.append((parts[2].strip(), self_us, cumulative_us))
+    return rows
+
+def profile_imports(modules: Iterable[str], top: int = 15) -> dict:
+    """Import modules in a fresh interpreter with -X importtime and summarize the cost"""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    rows = parse_importtime(result.stderr)
+
+    # Top-level packages: attribute each submodule's self time to its root
+    packages = {}
+    for module, self_us, _ in rows:
+        root = module.split(".", 1)[0]
+        packages[root] = packages.get(root, 0) + self_us
+
+    return {
+        "ok": result.returncode == 0,
+        "error": result.stderr.strip().splitlines()[-1] if result.returncode else None,
+        "modules": len(rows),
+        "total_ms": sum(self_us for _, self_us, _ in rows) / 1000,
+        "slowest": sorted(rows, key=lambda row: row[2], reverse=True)[:top],
+        "packages": sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top],
+    }
+
+def format_import_profile(profile: dict, target_ms: int) -> str:
+    """Human readable report for the --profile-imports mode"""
+    if not profile["ok"]:
+        return f"Import failed: {profile['error']}"
+
+    lines = [f"{profile['modules']} modules imported in {profile['total_ms']:.0f} ms (target {target_ms} ms)", ""]
+    lines.append("Slowest imports (cumulative):")
+    for module, self_us, cumulative_us in profile["slowest"]:
+        lines.append(f"  {cumulative_us / 1000:9.1f} ms  {self_us / 1000:8.1f} ms self  {module}")
+    lines.append("")
+    lines.append("By top-level package (self time):")
+    for package, self_us in profile["packages"]:
+        lines.append(f"  {self_us / 1000:9.1f} ms  {package}")
+    if profile["total_ms"] > target_ms:
+        lines.append("")
+        lines.append(f"Over the cold start target by {profile['total_ms'] - target_ms:.0f} ms")
+    return "\n".join(lines)
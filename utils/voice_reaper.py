@@ -0,0 +1,181 @@
+"""
+Voice reaper
+One scheduler task that leaves voice channels nobody is using
+"""
+import discord
+import asyncio
+import heapq
+import logging
+import time
+from typing import Optional, Dict, List, Tuple, Callable, Awaitable
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Called with the guild and "idle" or "empty"; expected to free the player and disconnect
+ReapHandler = Callable[[discord.Guild, str], Awaitable[None]]
+
+def count_listeners(channel: Optional[discord.abc.GuildChannel]) -> int:
+    """Humans in a voice channel"""
+    if channel is None:
+        return 0
+    return sum(1 for member in channel.members if not member.bot)
+
+class VoiceSession:
+    """Activity of one connected voice client"""
+    __slots__ = ("guild_id", "last_active", "listeners", "empty_since", "entry")
+
+    def __init__(self, guild_id: int, listeners: int, now: float):
+        self.guild_id = guild_id
+        self.last_active = now
+        self.listeners = listeners
+        self.empty_since: Optional[float] = None if listeners else now
+        self.entry: Optional[Tuple[float, int]] = None  # (deadline, generation) of its live heap entry
+
+class VoiceReaper:
+    """Disconnects voice clients idle for MUSIC_TIMEOUT or alone for MUSIC_EMPTY_TIMEOUT.
+
+    Sessions are kept in a heap of deadlines. Activity only moves a deadline later,
+    so it just updates the session; the early heap entry is rescheduled when it comes up.
+    A session has one live entry at a time: entries it no longer points to are skipped
+    when popped, and the heap is rebuilt if they pile up.
+    """
+
+    def __init__(self, bot, on_reap: ReapHandler,
+                 timeout: int = Config.MUSIC_TIMEOUT, empty_timeout: int = Config.MUSIC_EMPTY_TIMEOUT):
+        self.bot = bot
+        self.on_reap = on_reap
+        self.timeout = timeout
+        self.empty_timeout = empty_timeout
+        self.sessions: Dict[int, VoiceSession] = {}
+        self._deadlines: List[Tuple[float, int, int]] = []  # (monotonic deadline, generation, guild_id)
+        self._generation = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"reaped_idle": 0, "reaped_empty": 0}
+
+    def deadline(self, session: VoiceSession) -> float:
+        deadline = session.last_active + self.timeout
+        if session.empty_since is not None:
+            deadline = min(deadline, session.empty_since + self.empty_timeout)
+        return deadline
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def watch(self, guild_id: int, channel: Optional[discord.abc.GuildChannel]):
+        """Track a voice client that joined or moved to a channel"""
+        now = time.monotonic()
+        session = self.sessions[guild_id] = VoiceSession(guild_id, count_listeners(channel), now)
+        self._schedule(session)
+
+    def forget(self, guild_id: int):
+        """Stop tracking a disconnected voice client"""
+        self.sessions.pop(guild_id, None)
+
+    def touch(self, guild_id: int):
+        """Record activity, e.g. a command, pushing the idle deadline back"""
+        session = self.sessions.get(guild_id)
+        if session is not None:
+            session.last_active = time.monotonic()
+
+    def update_listeners(self, guild_id: int, channel: Optional[discord.abc.GuildChannel]):
+        """Recount the humans in the bot's channel after someone joined or left"""
+        session = self.sessions.get(guild_id)
+        if session is None:
+            return
+        session.listeners = count_listeners(channel)
+        if session.listeners:
+            session.empty_since = None
+        elif session.empty_since is None:
+            session.empty_since = time.monotonic()
+            self._schedule(session)  # Earlier than the idle deadline
+
+    def report(self) -> dict:
+        return {
+            **self.stats,
+            "sessions": len(self.sessions),
+            "listeners": sum(session.listeners for session in self.sessions.values()),
+            "empty": sum(1 for session in self.sessions.values() if session.empty_since is not None),
+        }
+
+    def _schedule(self, session: VoiceSession):
+        deadline = self.deadline(session)
+        if session.entry is not None and session.entry[0] <= deadline:
+            return  # Its live entry comes up first and reschedules then
+        self._generation += 1
+        session.entry = (deadline, self._generation)
+        heapq.heappush(self._deadlines, (deadline, self._generation, session.guild_id))
+        if len(self._deadlines) > 2 * len(self.sessions) + 16:
+            self._compact()
+        self._wakeup.set()
+
+    def _compact(self):
+        """Rebuild the heap from the live entries only"""
+        self._deadlines = [
+            (session.entry[0], session.entry[1], guild_id)
+            for guild_id, session in self.sessions.items() if session.entry is not None
+        ]
+        heapq.heapify(self._deadlines)
+
+    async def _loop(self):
+        """Sleep until the earliest deadline, then check that session"""
+        while True:
+            if not self._deadlines:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._deadlines[0][0] - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            deadline, generation, guild_id = heapq.heappop(self._deadlines)
+            session = self.sessions.get(guild_id)
+            if session is None or session.entry != (deadline, generation):
+                continue  # Superseded or forgotten
+            session.entry = None
+            try:
+                await self._check(guild_id)
+            except Exception as e:
+                logger.error(f"Failed to reap voice session in guild {guild_id}: {e}")
+
+    async def _check(self, guild_id: int):
+        session = self.sessions.get(guild_id)
+        if session is None:
+            return  # Already gone; a leftover heap entry
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild else None
+        if voice_client is None:
+            self.forget(guild_id)
+            return
+
+        now = time.monotonic()
+        if session.empty_since is not None and now >= session.empty_since + self.empty_timeout:
+            reason = "empty"
+        elif now >= session.last_active + self.timeout:
+            if voice_client.is_playing():
+                # Playing to listeners counts as activity; checked once per timeout, not per track
+                session.last_active = now
+                self._schedule(session)
+                return
+            reason = "idle"
+        else:
+            self._schedule(session)  # Activity moved the deadline
+            return
+
+        self.forget(guild_id)
+        self.stats[f"reaped_{reason}"] += 1
+        logger.info(f"Leaving voice in guild {guild_id}: {reason}")
+        await self.on_reap(guild, reason)
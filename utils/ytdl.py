@@ -0,0 +1,415 @@
+"""
+yt-dlp extraction
+Shared YoutubeDL instance with an LRU metadata cache and an expiry-aware stream URL cache
+"""
+import asyncio
+import concurrent.futures
+import itertools
+import logging
+import multiprocessing
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional, Tuple, Dict, Any, Callable, Awaitable, Iterator
+from urllib.parse import urlparse, parse_qs
+from config import Config
+from utils.player import stream_expiry
+
+logger = logging.getLogger(__name__)
+
+# YTDL Options
+YTDL_OPTIONS = {
+    'format': 'bestaudio/best',
+    'extractaudio': True,
+    'audioformat': 'mp3',
+    'outtmpl': 'data/%(extractor)s-%(id)s-%(title)s.%(ext)s',
+    'restrictfilenames': True,
+    'noplaylist': True,
+    'nocheckcertificate': True,
+    'ignoreerrors': False,
+    'logtostderr': False,
+    'quiet': True,
+    'no_warnings': True,
+    'default_search': 'auto',
+    'source_address': '0.0.0.0',
+}
+
+# Playlists are listed without visiting each video; entries are resolved when they come up
+PLAYLIST_OPTIONS = {
+    **YTDL_OPTIONS,
+    'noplaylist': False,
+    'extract_flat': 'in_playlist',
+}
+
+# Metadata kept per cached entry; the full info dict (formats, thumbnails...) is tens of KB
+METADATA_FIELDS = ("id", "title", "webpage_url", "duration", "extractor_key")
+
+_YOUTUBE_ID = re.compile(
+    r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})"
+)
+
+_ytdl = None
+
+def get_ytdl():
+    """Get the shared YoutubeDL instance, importing yt_dlp on first use"""
+    global _ytdl
+    if _ytdl is None:
+        import yt_dlp  # Heavy import, deferred so the cog loads fast even if nobody plays music
+        _ytdl = yt_dlp.YoutubeDL(YTDL_OPTIONS)
+    return _ytdl
+
+def extract_info(query: str) -> dict:
+    """Extract one video (first search result) and trim it to what the bot uses.
+
+    Runs in the extractor pool, so it has to be a picklable module-level function;
+    in process mode each worker builds its own YoutubeDL.
+    """
+    info = get_ytdl().extract_info(query, download=False)
+    if 'entries' in info:
+        info = info['entries'][0]
+    return {field: info.get(field) for field in (*METADATA_FIELDS, "url", "acodec")}
+
+class PlaylistCursor:
+    """Lists one playlist a page at a time, in a single pass.
+
+    yt-dlp's unprocessed playlist result yields entries lazily, fetching the site's
+    continuation pages as it goes, so every entry is listed once however many pages
+    are asked for. Pages must come one after another (the lock enforces it).
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.title: Optional[str] = None
+        self._entries: Optional[Iterator[dict]] = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        import yt_dlp
+        ydl = yt_dlp.YoutubeDL(PLAYLIST_OPTIONS)
+        info = ydl.extract_info(self.url, download=False, process=False)
+        if info.get('_type') == 'url':  # Redirect to the playlist's canonical URL
+            info = ydl.extract_info(info['url'], download=False, process=False)
+        self.title = info.get('title')
+        self._entries = iter(info.get('entries') or ())
+
+    def next_page(self, count: int) -> dict:
+        """The next count entries: {"title", "entries": [{"url", "title", "duration"}], "listed"}"""
+        with self._lock:
+            if self._entries is None:
+                self._open()
+            listed = list(itertools.islice(self._entries, count))
+        entries = []
+        for entry in listed:
+            if not entry:
+                continue  # Private or deleted video
+            entries.append({
+                "url": entry.get('webpage_url') or entry.get('url'),
+                "title": entry.get('title') or "Unknown title",
+                "duration": entry.get('duration'),
+            })
+        # listed counts skipped entries too, so callers can tell a short page from the end
+        return {"title": self.title, "entries": entries, "listed": len(listed)}
+
+def is_playlist_url(query: str) -> bool:
+    """True for playlist links (a watch link inside a playlist plays just that video)"""
+    parsed = urlparse(query)
+    host = parsed.netloc.lower()
+    if "youtube.com" in host:
+        return parsed.path == "/playlist" and "list" in parse_qs(parsed.query)
+    if "soundcloud.com" in host:
+        return "/sets/" in parsed.path
+    return False
+
+def cache_key(query: str) -> str:
+    """Normalize a URL or search so every spelling of the same video shares one entry"""
+    match = _YOUTUBE_ID.search(query)
+    if match:
+        return f"youtube:{match.group(1)}"
+    if query.startswith("ytsearch:"):
+        return "ytsearch:" + " ".join(query[len("ytsearch:"):].lower().split())
+    return query.split("#", 1)[0].rstrip("/")
+
+def info_key(info: dict) -> str:
+    """Cache key of an extracted video"""
+    if info.get("extractor_key") == "Youtube" and info.get("id"):
+        return f"youtube:{info['id']}"
+    return cache_key(info.get("webpage_url") or info.get("url", ""))
+
+class LRUCache:
+    """OrderedDict LRU bounded by entry count and approximate size in bytes"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @staticmethod
+    def sizeof(key: str, value: Any) -> int:
+        """Rough footprint: string payload plus fixed per-entry overhead"""
+        payload = value.values() if isinstance(value, dict) else value
+        return 200 + len(key) + sum(len(str(item)) for item in payload)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Get without touching recency or the hit/miss counters"""
+        entry = self._data.get(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key: str, value: Any):
+        self.pop(key)
+        size = self.sizeof(key, value)
+        self._data[key] = (value, size)
+        self.bytes += size
+        while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def pop(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+class ExtractorBusy(Exception):
+    """The extractor pool's wait queue is full"""
+
+class _Job:
+    __slots__ = ("guild_id", "func", "args", "future", "threaded", "queued_at")
+
+    def __init__(self, guild_id: int, func: Callable, args: tuple, future: asyncio.Future, threaded: bool = False):
+        self.guild_id = guild_id
+        self.func = func
+        self.args = args
+        self.future = future
+        self.threaded = threaded
+        self.queued_at = time.perf_counter()
+
+class ExtractorPool:
+    """Dedicated yt-dlp workers with a bounded wait queue.
+
+    Jobs wait in per-guild FIFOs and are started round-robin across guilds, with at
+    most per_guild running for any one guild, so a guild queueing many songs can't
+    starve the others.
+    """
+
+    def __init__(self, workers: int = Config.MUSIC_EXTRACTOR_WORKERS, queue_size: int = Config.MUSIC_EXTRACTOR_QUEUE_SIZE,
+                 per_guild: int = Config.MUSIC_EXTRACTOR_PER_GUILD, mode: str = Config.MUSIC_EXTRACTOR_MODE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.per_guild = per_guild
+        self.mode = mode
+        self._executor: Optional[concurrent.futures.Executor] = None
+        self._threads: Optional[concurrent.futures.ThreadPoolExecutor] = None  # Threaded jobs in process mode
+        self._waiting: "OrderedDict[int, deque]" = OrderedDict()  # guild_id -> jobs, in round-robin order
+        self._running: Dict[int, int] = {}
+        self.waiting = 0
+        self.in_flight = 0
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "queued": 0, "max_wait_ms": 0.0}
+
+    def _get_executor(self, threaded: bool = False) -> concurrent.futures.Executor:
+        if threaded and self.mode == "process":
+            if self._threads is None:
+                self._threads = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="ytdl")
+            return self._threads
+        if self._executor is None:
+            if self.mode == "process":
+                # Python-heavy parsing then runs outside this interpreter's GIL
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="ytdl")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+
+    async def run(self, guild_id: int, func: Callable, *args,
+                  on_queued: Optional[Callable[[int], Awaitable[None]]] = None, threaded: bool = False):
+        """Run func(*args) in the pool; on_queued(position) is awaited if the job has to wait.
+
+        threaded jobs always run on a thread, for work that can't be sent to another process.
+        """
+        if self.waiting >= self.queue_size:
+            self.stats["rejected"] += 1
+            raise ExtractorBusy("Too many music requests right now, please try again in a moment.")
+
+        job = _Job(guild_id, func, args, asyncio.get_running_loop().create_future(), threaded)
+        self._waiting.setdefault(guild_id, deque()).append(job)
+        self.waiting += 1
+        self._dispatch()
+
+        jobs = self._waiting.get(guild_id, ())
+        if not job.future.done() and job in jobs:
+            self.stats["queued"] += 1
+            if on_queued is not None:
+                try:
+                    await on_queued(jobs.index(job) + 1)  # Position among this guild's waiting jobs
+                except Exception as e:
+                    # Only a notice; the job stays queued and its result is still awaited
+                    logger.warning(f"Extractor on_queued callback failed in guild {guild_id}: {e}")
+        return await job.future
+
+    def _dispatch(self):
+        """Start waiting jobs round-robin across guilds while workers are free"""
+        while self.in_flight < self.workers and self._waiting:
+            started = False
+            for guild_id in list(self._waiting):
+                if self.in_flight >= self.workers:
+                    break
+                if self._running.get(guild_id, 0) >= self.per_guild:
+                    continue
+                jobs = self._waiting[guild_id]
+                job = jobs.popleft()
+                self.waiting -= 1
+                if jobs:
+                    self._waiting.move_to_end(guild_id)  # Next guild goes first next time
+                else:
+                    del self._waiting[guild_id]
+                if job.future.cancelled():
+                    continue
+                self._start(job)
+                started = True
+            if not started:
+                break
+
+    def _start(self, job: _Job):
+        waited_ms = (time.perf_counter() - job.queued_at) * 1000
+        self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], waited_ms)
+        self.in_flight += 1
+        self._running[job.guild_id] = self._running.get(job.guild_id, 0) + 1
+        work = asyncio.get_running_loop().run_in_executor(self._get_executor(job.threaded), job.func, *job.args)
+        work.add_done_callback(lambda done: self._finish(job, done))
+
+    def _finish(self, job: _Job, done: asyncio.Future):
+        self.in_flight -= 1
+        self._running[job.guild_id] -= 1
+        if not self._running[job.guild_id]:
+            del self._running[job.guild_id]
+
+        if done.cancelled():
+            job.future.cancel()
+        elif done.exception() is not None:
+            self.stats["failed"] += 1
+            if not job.future.done():
+                job.future.set_exception(done.exception())
+        else:
+            self.stats["completed"] += 1
+            if not job.future.done():
+                job.future.set_result(done.result())
+        self._dispatch()
+
+class YTDLExtractor:
+    """Runs yt-dlp lookups, serving repeats from memory"""
+
+    def __init__(self):
+        self.pool = ExtractorPool()
+        self.metadata = LRUCache(Config.MUSIC_METADATA_CACHE_SIZE, Config.MUSIC_METADATA_CACHE_BYTES)
+        # key -> (stream_url, expires_at, acodec); an entry is only served while it outlives the track
+        self.streams = LRUCache(Config.MUSIC_STREAM_CACHE_SIZE, Config.MUSIC_STREAM_CACHE_BYTES)
+        self.extractions = 0
+
+    async def _extract(self, query: str, guild_id: int, on_queued=None) -> dict:
+        self.extractions += 1
+        return await self.pool.run(guild_id, extract_info, query, on_queued=on_queued)
+
+    def _store(self, info: dict, *keys: str) -> dict:
+        """Cache the slim metadata (under every key it was asked by) and the stream URL"""
+        metadata = {field: info.get(field) for field in METADATA_FIELDS}
+        aliases = {info_key(info), *keys}
+        for alias in aliases:
+            self.metadata.put(alias, metadata)
+        if info.get("url"):
+            expires_at = stream_expiry(info["url"]) or time.time() + Config.MUSIC_STREAM_CACHE_TTL
+            for alias in aliases:
+                if not alias.startswith("ytsearch:"):  # Searches resolve through their video's key
+                    self.streams.put(alias, (info["url"], expires_at, info.get("acodec")))
+        return metadata
+
+    def _cached_stream(self, key: str, valid_for: float) -> Optional[Tuple[str, Optional[str]]]:
+        """(stream_url, acodec) if cached and valid for long enough"""
+        entry = self.streams.get(key)
+        if entry is None:
+            return None
+        stream_url, expires_at, acodec = entry
+        if expires_at < time.time() + valid_for:
+            self.streams.pop(key)
+            return None
+        return stream_url, acodec
+
+    async def lookup(self, query: str, guild_id: int = 0, on_queued=None) -> Dict[str, Any]:
+        """Metadata for a URL or search, plus 'url' (the stream) and 'acodec' when one is cached"""
+        key = cache_key(query)
+        metadata = self.metadata.get(key)
+        if metadata is None:
+            info = await self._extract(query, guild_id, on_queued)
+            metadata = self._store(info, key)
+            return {**metadata, "url": info.get("url"), "acodec": info.get("acodec")}
+
+        valid_for = (metadata.get("duration") or 0) + Config.MUSIC_STREAM_REFRESH_MARGIN
+        stream = self._cached_stream(info_key(metadata), valid_for)
+        return {**metadata, "url": stream[0] if stream else None, "acodec": stream[1] if stream else None}
+
+    async def resolve_stream(self, url: str, valid_for: float = 0, guild_id: int = 0) -> Dict[str, Any]:
+        """Direct stream 'url', 'duration' and 'acodec' of a video, valid for at least valid_for seconds"""
+        key = cache_key(url)
+        stream = self._cached_stream(key, valid_for)
+        if stream is not None:
+            metadata = self.metadata.peek(key)
+            return {"url": stream[0], "duration": metadata.get("duration") if metadata else None, "acodec": stream[1]}
+
+        info = await self._extract(url, guild_id)
+        self._store(info, key)
+        return {"url": info["url"], "duration": info.get("duration"), "acodec": info.get("acodec")}
+
+    async def playlist_page(self, cursor: PlaylistCursor, count: int, guild_id: int = 0) -> dict:
+        """The next page of flat entries from a playlist cursor (see PlaylistCursor.next_page)"""
+        self.extractions += 1
+        # The cursor holds a live generator, so it stays on a thread even in process mode
+        return await self.pool.run(guild_id, cursor.next_page, count, threaded=True)
+
+    def shutdown(self):
+        """Stop the workers; they start again on the next request"""
+        self.pool.shutdown()
+
+    def stats(self) -> dict:
+        return {
+            "extractions": self.extractions,
+            "pool": {**self.pool.stats, "waiting": self.pool.waiting, "in_flight": self.pool.in_flight},
+            "metadata": self.metadata.stats(),
+            "streams": self.streams.stats(),
+        }
+
+extractor = YTDLExtractor()